@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+音频指纹去重
+为视频音频计算紧凑的声学指纹，按指纹查找已经转写过的相同音频（换了作品ID重新上传的视频），直接复用转文字结果
+"""
+
+import argparse
+import json
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# 指纹计算参数：8kHz 单声道，每帧 256ms，帧移 16ms（帧移小一些，起点错位的重新上传视频也能对齐），300-2000Hz 分成 33 个对数频带，每帧得到 32 位子指纹
+SAMPLE_RATE = 8000
+FRAME_SIZE = 2048
+HOP_SIZE = 128
+MIN_FREQ = 300.0
+MAX_FREQ = 2000.0
+BANDS = 33
+
+# 每隔多少帧把子指纹写入倒排索引（查询时使用全部帧，只要有一帧完全相同即可找到候选）
+KEY_STRIDE = 4
+
+# 默认相似度阈值（1 - 误码率），低于该值不视为同一段音频
+DEFAULT_THRESHOLD = 0.85
+
+# 两段指纹对齐后重叠部分至少占较长一段的比例，避免一段短音频匹配到包含它的长音频
+MIN_OVERLAP_RATIO = 0.9
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS fingerprints (
+    id INTEGER PRIMARY KEY,
+    video_id TEXT UNIQUE,
+    frames INTEGER,
+    fingerprint BLOB,
+    result TEXT,
+    created REAL
+);
+CREATE TABLE IF NOT EXISTS fingerprint_keys (
+    key INTEGER,
+    fingerprint_id INTEGER,
+    frame INTEGER
+);
+CREATE INDEX IF NOT EXISTS fingerprint_keys_key ON fingerprint_keys (key);
+'''
+
+
+def _load_sibling(name):
+    """从同目录加载脚本模块（如 transcribe_audio_funasr）"""
+    module = sys.modules.get(name)
+    if module is None:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, Path(__file__).parent / f'{name}.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+    return module
+
+
+def compute_fingerprint(audio_path=None, waveform=None):
+    """计算音频指纹，返回 uint32 数组（每帧一个子指纹）
+
+    子指纹的每一位表示相邻两个频带能量差在相邻两帧之间的变化方向，对重新编码、音量变化不敏感。
+    可以直接传入 SAMPLE_RATE 采样率的单声道波形，否则使用 FFmpeg 解码 audio_path。
+    """
+    import numpy as np
+
+    if waveform is None:
+        waveform = _load_sibling('transcribe_audio_funasr').load_audio_pcm(audio_path, SAMPLE_RATE)
+    waveform = np.asarray(waveform, dtype=np.float32)
+    frame_count = 1 + (len(waveform) - FRAME_SIZE) // HOP_SIZE if len(waveform) >= FRAME_SIZE else 0
+    if frame_count < 2:
+        return np.zeros(0, dtype=np.uint32)
+
+    # 频带边界（对数均匀分布）对应的 FFT 频点
+    edges = np.geomspace(MIN_FREQ, MAX_FREQ, BANDS + 1)
+    bins = np.unique(np.round(edges * FRAME_SIZE / SAMPLE_RATE).astype(int))
+    window = np.hanning(FRAME_SIZE).astype(np.float32)
+
+    energies = np.empty((frame_count, len(bins) - 1), dtype=np.float32)
+    # 分块计算，避免长视频一次性展开全部帧占用大量内存
+    for start in range(0, frame_count, 1024):
+        stop = min(frame_count, start + 1024)
+        indices = np.arange(start, stop)[:, None] * HOP_SIZE + np.arange(FRAME_SIZE)[None, :]
+        spectrum = np.abs(np.fft.rfft(waveform[indices] * window, axis=1)) ** 2
+        energies[start:stop] = np.add.reduceat(spectrum[:, bins[0]:bins[-1]], bins[:-1] - bins[0], axis=1)
+
+    band_diff = energies[:, :-1] - energies[:, 1:]
+    bits = (band_diff[1:] - band_diff[:-1]) > 0
+    bits = bits[:, :32]
+    weights = (1 << np.arange(bits.shape[1] - 1, -1, -1)).astype(np.uint64)
+    return (bits.astype(np.uint64) @ weights).astype(np.uint32)
+
+
+def compare_fingerprints(a, b, offset=0):
+    """按 offset（b 相对 a 的帧偏移）对齐后比较两段指纹，返回 (相似度, 重叠帧数)
+
+    相似度 = 1 - 误码率；重叠帧数为 0 时相似度为 0。
+    """
+    import numpy as np
+
+    start_a = max(0, -offset)
+    start_b = max(0, offset)
+    overlap = min(len(a) - start_a, len(b) - start_b)
+    if overlap <= 0:
+        return 0.0, 0
+    diff = np.bitwise_xor(a[start_a:start_a + overlap], b[start_b:start_b + overlap])
+    errors = int(np.unpackbits(diff.view(np.uint8)).sum())
+    return 1.0 - errors / (32.0 * overlap), overlap
+
+
+class FingerprintIndex:
+    """指纹索引
+
+    fingerprints 保存完整指纹和对应的转文字结果，fingerprint_keys 是子指纹到（指纹, 帧号）的倒排索引。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def add(self, video_id, fingerprint, result):
+        """保存作品的指纹和转文字结果（{'code': ..., 'data': ...}），同一作品ID再次保存时覆盖"""
+        import numpy as np
+
+        fingerprint = np.asarray(fingerprint, dtype=np.uint32)
+        with self._conn:
+            row = self._conn.execute('SELECT id FROM fingerprints WHERE video_id = ?', (str(video_id),)).fetchone()
+            if row:
+                self._conn.execute('DELETE FROM fingerprint_keys WHERE fingerprint_id = ?', (row[0],))
+                self._conn.execute('DELETE FROM fingerprints WHERE id = ?', (row[0],))
+            cursor = self._conn.execute(
+                'INSERT INTO fingerprints (video_id, frames, fingerprint, result, created) VALUES (?, ?, ?, ?, ?)',
+                (
+                    str(video_id),
+                    len(fingerprint),
+                    fingerprint.astype('<u4').tobytes(),
+                    json.dumps(result, ensure_ascii=False, default=str),
+                    time.time(),
+                ),
+            )
+            fingerprint_id = cursor.lastrowid
+            self._conn.executemany(
+                'INSERT INTO fingerprint_keys (key, fingerprint_id, frame) VALUES (?, ?, ?)',
+                [
+                    (int(fingerprint[frame]), fingerprint_id, frame)
+                    for frame in range(0, len(fingerprint), KEY_STRIDE)
+                    if fingerprint[frame] != 0
+                ],
+            )
+
+    def update_result_data(self, video_id, **fields):
+        """更新已保存的转文字结果中 data 的字段（如批量补标点后的文本），返回是否找到该作品"""
+        with self._conn:
+            row = self._conn.execute('SELECT result FROM fingerprints WHERE video_id = ?', (str(video_id),)).fetchone()
+            if row is None:
+                return False
+            result = json.loads(row[0])
+            result.setdefault('data', {}).update(fields)
+            self._conn.execute(
+                'UPDATE fingerprints SET result = ? WHERE video_id = ?',
+                (json.dumps(result, ensure_ascii=False, default=str), str(video_id)),
+            )
+        return True
+
+    def find(self, fingerprint, threshold=DEFAULT_THRESHOLD, candidates=5):
+        """查找与指纹最相似的已保存音频
+
+        返回 {'video_id', 'similarity', 'result'}，没有达到阈值的结果时返回 None。
+        """
+        import numpy as np
+
+        fingerprint = np.asarray(fingerprint, dtype=np.uint32)
+        if len(fingerprint) == 0:
+            return None
+
+        # 子指纹完全相同的帧给（候选指纹, 帧偏移）投票
+        frames_by_key = {}
+        for frame, key in enumerate(fingerprint.tolist()):
+            if key:
+                frames_by_key.setdefault(key, []).append(frame)
+        votes = {}
+        keys = list(frames_by_key)
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            rows = self._conn.execute(
+                f'SELECT key, fingerprint_id, frame FROM fingerprint_keys WHERE key IN ({",".join("?" * len(chunk))})',
+                chunk,
+            ).fetchall()
+            for key, fingerprint_id, frame in rows:
+                for probe_frame in frames_by_key[key]:
+                    vote = (fingerprint_id, frame - probe_frame)
+                    votes[vote] = votes.get(vote, 0) + 1
+
+        best = None
+        for (fingerprint_id, offset), _ in sorted(votes.items(), key=lambda item: -item[1])[:candidates]:
+            video_id, frames, blob, result = self._conn.execute(
+                'SELECT video_id, frames, fingerprint, result FROM fingerprints WHERE id = ?', (fingerprint_id,)
+            ).fetchone()
+            stored = np.frombuffer(blob, dtype='<u4').astype(np.uint32)
+            similarity, overlap = compare_fingerprints(fingerprint, stored, offset)
+            if overlap < MIN_OVERLAP_RATIO * max(len(fingerprint), len(stored)):
+                continue
+            if similarity >= threshold and (best is None or similarity > best['similarity']):
+                best = {'video_id': video_id, 'similarity': round(similarity, 4), 'result': json.loads(result)}
+        return best
+
+    def count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM fingerprints').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='计算和比较视频音频指纹')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    compare_parser = subparsers.add_parser('compare', help='比较两个音视频文件的音频相似度（用于调整阈值）')
+    compare_parser.add_argument('files', type=str, nargs=2, help='两个音视频文件')
+
+    match_parser = subparsers.add_parser('match', help='在指纹库中查找与文件音频相同的作品')
+    match_parser.add_argument('--db', type=str, required=True, help='指纹库文件路径（即 --fingerprint-db）')
+    match_parser.add_argument('file', type=str, help='音视频文件')
+    match_parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                              help=f'相似度阈值，默认为 {DEFAULT_THRESHOLD}')
+
+    args = parser.parse_args()
+
+    try:
+        if args.command == 'compare':
+            a, b = (compute_fingerprint(path) for path in args.files)
+            best = (0.0, 0)
+            # 前后各允许 2 秒的错位
+            max_offset = 2 * SAMPLE_RATE // HOP_SIZE
+            for offset in range(-max_offset, max_offset + 1):
+                candidate = compare_fingerprints(a, b, offset)
+                if candidate[1] and candidate[0] > best[0]:
+                    best = candidate
+            print(f"相似度: {best[0]:.4f}（重叠 {best[1]} 帧，共 {len(a)} / {len(b)} 帧）")
+            return 0
+
+        with FingerprintIndex(args.db) as index:
+            match = index.find(compute_fingerprint(args.file), args.threshold)
+        if not match:
+            print("未找到相同的音频")
+            return 1
+        print(f"{match['video_id']}  相似度 {match['similarity']}")
+        print(match['result'].get('data', {}).get('text', ''))
+        return 0
+    except ImportError:
+        print("❌ 需要安装 numpy", file=sys.stderr)
+        return 1
+    except Exception as e:
+        print(f"❌ 计算指纹失败: {e}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+批量任务日志
+以追加写入的 JSON Lines 文件记录每个链接的处理阶段和产物，中断后重跑可跳过已完成的工作
+"""
+
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# 处理阶段，按先后顺序排列
+STAGES = ('resolved', 'downloaded', 'transcribed')
+
+
+class JobJournal:
+    """追加写入的任务日志
+
+    每行一条记录: {"key": 链接, "stage": 阶段, "outputs": {...}, "time": 时间戳}
+    加载时按顺序重放，同一链接的 outputs 依次合并，阶段只前进不后退。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        """重放已有日志"""
+        if not self.path.exists():
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # 进程在写入时被杀掉会留下不完整的最后一行，直接忽略
+                    continue
+                self._apply(entry)
+
+    def _apply(self, entry):
+        key = entry.get('key')
+        stage = entry.get('stage')
+        if not key or stage not in STAGES:
+            return
+        job = self._jobs.setdefault(key, {'stage': None, 'outputs': {}})
+        job['outputs'].update(entry.get('outputs') or {})
+        if job['stage'] is None or STAGES.index(stage) > STAGES.index(job['stage']):
+            job['stage'] = stage
+
+    def get(self, key):
+        """返回 {'stage': 阶段, 'outputs': {...}}，没有记录时返回 None"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return None
+            return {'stage': job['stage'], 'outputs': dict(job['outputs'])}
+
+    def reached(self, key, stage):
+        """判断链接是否已经完成某个阶段"""
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None or job['stage'] is None:
+                return False
+            return STAGES.index(job['stage']) >= STAGES.index(stage)
+
+    def record(self, key, stage, **outputs):
+        """记录链接完成了某个阶段，写入后立即落盘"""
+        if stage not in STAGES:
+            raise ValueError(f'未知的任务阶段: {stage}')
+        entry = {'key': key, 'stage': stage, 'outputs': outputs, 'time': round(time.time(), 3)}
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            self._file.write(line + '\n')
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._apply(entry)
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+常驻模型注册表
+在长时间运行的进程中按内存预算缓存多个模型组合，相同组件（如同一个 fsmn-vad）只加载一次，
+超出预算时淘汰最久未使用的组件
+"""
+
+import gc
+import threading
+from collections import OrderedDict
+
+
+class ModelRegistry:
+    """按 LRU 淘汰的模型注册表
+
+    组件（component）是单独加载的模型，按 key 去重并计入内存预算；
+    组合（pipeline）由若干组件拼装而成，本身不占额外内存，组件被淘汰时一并失效。
+    """
+
+    def __init__(self, max_memory_mb=None):
+        self.max_memory_mb = max_memory_mb
+        self._lock = threading.RLock()
+        self._components = OrderedDict()
+        self._pipelines = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def memory_bytes(self):
+        """当前已加载组件的估算内存（字节）"""
+        with self._lock:
+            return sum(entry['size'] for entry in self._components.values())
+
+    def get_component(self, key, loader, protect=()):
+        """获取组件，未加载时调用 loader() -> (模型, 估算字节数) 加载
+
+        protect 中的组件在本次加载引起的淘汰中不会被淘汰。
+        """
+        with self._lock:
+            entry = self._components.get(key)
+            if entry is not None:
+                self._components.move_to_end(key)
+                self.hits += 1
+                return entry['model']
+            self.misses += 1
+            model, size = loader()
+            self._components[key] = {'model': model, 'size': size or 0}
+            self._evict(set(protect) | {key})
+            return model
+
+    def get_pipeline(self, key, parts, builder):
+        """获取由多个组件拼装的组合
+
+        parts 为 [(组件key, loader), ...]，组件 key 为 None 时对应位置传入 None；
+        builder(*组件) 返回拼装好的组合。
+        """
+        with self._lock:
+            component_keys = [part_key for part_key, _ in parts if part_key is not None]
+            models = [
+                self.get_component(part_key, loader, protect=component_keys) if part_key is not None else None
+                for part_key, loader in parts
+            ]
+            entry = self._pipelines.get(key)
+            if entry is None:
+                entry = {'model': builder(*models), 'components': set(component_keys)}
+                self._pipelines[key] = entry
+            return entry['model']
+
+    def _evict(self, protect):
+        """超出内存预算时按最久未使用的顺序淘汰组件"""
+        if not self.max_memory_mb:
+            return
+        budget = self.max_memory_mb * 1024 * 1024
+        evicted = False
+        while self.memory_bytes > budget:
+            victim = next((key for key in self._components if key not in protect), None)
+            if victim is None:
+                # 剩下的都是当前请求需要的组件，只能暂时超出预算
+                break
+            del self._components[victim]
+            for pipeline_key in [k for k, v in self._pipelines.items() if victim in v['components']]:
+                del self._pipelines[pipeline_key]
+            self.evictions += 1
+            evicted = True
+        if evicted:
+            gc.collect()
+
+    def clear(self):
+        """卸载所有模型"""
+        with self._lock:
+            self._components.clear()
+            self._pipelines.clear()
+        gc.collect()
+
+    def stats(self):
+        """返回注册表状态（用于诊断）"""
+        with self._lock:
+            return {
+                'components': [
+                    {'key': list(key) if isinstance(key, tuple) else key, 'size_mb': round(entry['size'] / 1048576, 1)}
+                    for key, entry in self._components.items()
+                ],
+                'pipelines': len(self._pipelines),
+                'memory_mb': round(self.memory_bytes / 1048576, 1),
+                'max_memory_mb': self.max_memory_mb,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+def torch_model_bytes(module):
+    """估算 torch 模型参数和缓冲区占用的字节数"""
+    try:
+        tensors = list(module.parameters()) + list(module.buffers())
+    except AttributeError:
+        return 0
+    return sum(tensor.numel() * tensor.element_size() for tensor in tensors)
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+本地模型仓库
+预先下载并固定 FunASR 使用的模型到本地目录，加载时直接使用本地路径，避免每次启动都走模型中心查询
+"""
+
+import argparse
+import json
+import os
+import sys
+from pathlib import Path
+
+# 默认模型仓库目录，可通过环境变量 DOUYIN_MODEL_STORE 修改
+DEFAULT_STORE_DIR = Path(os.environ.get('DOUYIN_MODEL_STORE', Path(__file__).parent / 'models'))
+
+MANIFEST_NAME = 'store.json'
+
+DEFAULT_MODELS = ('paraformer-zh', 'fsmn-vad', 'ct-punc')
+
+# FunASR 模型简称对应的 ModelScope 模型ID（与 funasr 内置映射保持一致）
+MODEL_IDS = {
+    'paraformer-zh': 'iic/speech_seaco_paraformer_large_asr_nat-zh-cn-16k-common-vocab8404-pytorch',
+    'fsmn-vad': 'iic/speech_fsmn_vad_zh-cn-16k-common-pytorch',
+    'ct-punc': 'iic/punc_ct-transformer_cn-en-common-vocab471067-large',
+}
+
+
+def get_model_id(name):
+    """将模型简称转换为 ModelScope 模型ID，优先使用 funasr 内置映射"""
+    try:
+        from funasr.download.name_maps_from_hub import name_maps_ms
+        if name in name_maps_ms:
+            return name_maps_ms[name]
+    except ImportError:
+        pass
+    return MODEL_IDS.get(name, name)
+
+
+def load_manifest(store_dir=None):
+    """读取模型仓库清单，不存在时返回空字典"""
+    manifest_path = Path(store_dir or DEFAULT_STORE_DIR) / MANIFEST_NAME
+    if not manifest_path.exists():
+        return {}
+    try:
+        return json.loads(manifest_path.read_text(encoding='utf-8'))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def save_manifest(manifest, store_dir=None):
+    """写入模型仓库清单（先写临时文件再替换，避免并发读取到半个文件）"""
+    store_dir = Path(store_dir or DEFAULT_STORE_DIR)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest_path = store_dir / MANIFEST_NAME
+    tmp_path = manifest_path.with_suffix('.tmp')
+    tmp_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding='utf-8')
+    os.replace(tmp_path, manifest_path)
+
+
+def resolve_model_path(name, store_dir=None):
+    """返回模型在本地仓库中的路径；未预先下载时原样返回模型名"""
+    if not name:
+        return name
+    if os.path.isdir(name):
+        return name
+    store_dir = Path(store_dir or DEFAULT_STORE_DIR)
+    entry = load_manifest(store_dir).get(name)
+    if entry:
+        model_path = store_dir / entry['path']
+        if model_path.is_dir():
+            return str(model_path)
+    return name
+
+
+def fetch_models(names=DEFAULT_MODELS, store_dir=None, revision=None):
+    """下载模型到本地仓库并写入清单，返回 {模型名: 本地路径}"""
+    from modelscope.hub.snapshot_download import snapshot_download
+
+    store_dir = Path(store_dir or DEFAULT_STORE_DIR)
+    store_dir.mkdir(parents=True, exist_ok=True)
+    manifest = load_manifest(store_dir)
+    paths = {}
+    for name in names:
+        model_id = get_model_id(name)
+        print(f"正在下载模型 {name} ({model_id})...")
+        kwargs = {'cache_dir': str(store_dir / 'hub')}
+        if revision:
+            kwargs['revision'] = revision
+        model_path = Path(snapshot_download(model_id, **kwargs)).resolve()
+        try:
+            relative_path = model_path.relative_to(store_dir.resolve())
+        except ValueError:
+            relative_path = model_path
+        manifest[name] = {
+            'model_id': model_id,
+            'revision': revision or 'master',
+            'path': str(relative_path),
+        }
+        paths[name] = str(model_path)
+        print(f"✅ {name} 已保存到: {model_path}")
+    save_manifest(manifest, store_dir)
+    return paths
+
+
+def export_onnx(names=DEFAULT_MODELS, store_dir=None, quantize=True):
+    """将本地仓库中的模型导出为 ONNX（供 --backend onnx 使用），导出文件保存在模型目录中"""
+    from funasr import AutoModel
+
+    for name in names:
+        model_path = resolve_model_path(name, store_dir)
+        if not os.path.isdir(model_path):
+            raise ValueError(f'模型 {name} 不在本地仓库中，请先运行 fetch')
+        print(f"正在导出 ONNX 模型 {name}...")
+        AutoModel(model=model_path, disable_update=True).export(type='onnx', quantize=quantize)
+        print(f"✅ {name} 已导出到: {model_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='管理本地 FunASR 模型仓库')
+    parser.add_argument('--store-dir', type=str, default=None, help=f'模型仓库目录，默认为 {DEFAULT_STORE_DIR}')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    fetch_parser = subparsers.add_parser('fetch', help='预先下载模型到本地仓库')
+    fetch_parser.add_argument('--models', type=str, nargs='+', default=list(DEFAULT_MODELS),
+                              help='要下载的模型，默认为 paraformer-zh fsmn-vad ct-punc')
+    fetch_parser.add_argument('--revision', type=str, default=None, help='固定的模型版本（ModelScope revision）')
+    fetch_parser.add_argument('--onnx', action='store_true', help='下载后导出量化 ONNX 模型（供 --backend onnx 使用）')
+
+    subparsers.add_parser('list', help='列出本地仓库中的模型')
+
+    args = parser.parse_args()
+
+    if args.command == 'fetch':
+        try:
+            fetch_models(args.models, args.store_dir, args.revision)
+            if args.onnx:
+                export_onnx(args.models, args.store_dir)
+        except ImportError:
+            print("❌ 未安装 modelscope，请先安装 FunASR 依赖（python scripts/setup_venv.py）", file=sys.stderr)
+            return 1
+        except Exception as e:
+            print(f"❌ 下载模型失败: {e}", file=sys.stderr)
+            return 1
+        return 0
+
+    manifest = load_manifest(args.store_dir)
+    if not manifest:
+        print("本地模型仓库为空，请先运行: python scripts/model_store.py fetch")
+        return 0
+    for name, entry in manifest.items():
+        print(f"{name}: {resolve_model_path(name, args.store_dir)} ({entry['model_id']}@{entry['revision']})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
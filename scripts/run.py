@@ -6,88 +6,68 @@
 如果虚拟环境不存在，会自动创建
 """
 
+import contextlib
+import importlib.util
 import os
 import sys
-import subprocess
 from pathlib import Path
 
 
-def get_venv_path():
-    """获取虚拟环境路径"""
-    script_dir = Path(__file__).parent
-    return script_dir / "venv"
+def load_setup_module():
+    """加载同目录下的 setup_venv.py"""
+    module_path = Path(__file__).parent / "setup_venv.py"
+    spec = importlib.util.spec_from_file_location("setup_venv", module_path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
 
 
-def get_python_command(venv_path):
-    """获取虚拟环境中的python命令路径"""
+def check_and_setup_venv():
+    """检查并设置虚拟环境
+
+    只在虚拟环境不存在时创建并安装依赖；已有的虚拟环境没有安装完成标记（旧版本创建的）
+    或标记中的哈希与依赖文件一致时原样使用，不加载安装逻辑、不输出任何信息。
+    依赖文件有变化时复用 setup_venv.py 的安装逻辑，更新失败时（如离线）继续使用现有虚拟环境。
+    安装信息输出到 stderr，避免干扰主脚本的 stdout（如 --jsonl 输出）。
+    """
+    setup_venv = load_setup_module()
+    venv_path = setup_venv.get_venv_path()
+    
+    python_cmd = setup_venv.get_python_command(venv_path)
     if sys.platform == "win32":
-        python_cmd = venv_path / "Scripts" / "python.exe"
-    else:
-        python_cmd = venv_path / "bin" / "python"
+        python_cmd = python_cmd.with_suffix(".exe")
     
-    if not python_cmd.exists():
-        return None
-    return python_cmd
-
-
-def check_and_setup_venv():
-    """检查并设置虚拟环境"""
-    venv_path = get_venv_path()
+    existing = python_cmd.exists()
+    if existing and (not setup_venv.read_marker(venv_path) or setup_venv.is_up_to_date(venv_path)):
+        # 没有标记（旧版本创建的）或依赖未变化时直接使用，不调用 ensure_venv
+        return python_cmd
     
-    # 如果虚拟环境不存在，创建它
-    if not venv_path.exists():
-        print("虚拟环境不存在，正在创建...")
-        try:
-            # 直接创建虚拟环境
-            subprocess.run(
-                [sys.executable, "-m", "venv", str(venv_path)],
-                check=True,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            if not venv_path.exists():
+                print("虚拟环境不存在，正在创建...")
+            ok = setup_venv.ensure_venv(
+                wheelhouse=setup_venv.DEFAULT_WHEELHOUSE,
+                interactive=False,
             )
-            print("✅ 虚拟环境创建成功")
-            
-            # 安装基础依赖
-            pip_cmd = get_pip_command(venv_path)
-            if pip_cmd and pip_cmd.exists():
-                print("正在安装基础依赖...")
-                subprocess.run(
-                    [str(pip_cmd), "install", "--upgrade", "pip", "--quiet"],
-                    check=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                subprocess.run(
-                    [str(pip_cmd), "install", "requests>=2.20.0", "urllib3>=1.24.0", "--quiet"],
-                    check=True,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE
-                )
-                print("✅ 基础依赖安装完成")
-                print("💡 提示：如需使用转文字功能，请运行: python scripts/setup_venv.py 安装 FunASR")
-        except subprocess.CalledProcessError as e:
-            print(f"❌ 创建虚拟环境失败: {e}")
-            return None
-        except Exception as e:
-            print(f"❌ 创建虚拟环境失败: {e}")
-            return None
+            if ok and not existing and not setup_venv.read_marker(venv_path).get("funasr"):
+                print("💡 提示：如需使用转文字功能，请运行: python scripts/setup_venv.py --with-funasr 安装 FunASR")
+    except Exception as e:
+        print(f"❌ 创建虚拟环境失败: {e}", file=sys.stderr)
+        ok = False
+    if not ok:
+        if existing and python_cmd.exists():
+            print("⚠️  更新依赖失败，继续使用现有虚拟环境", file=sys.stderr)
+            return python_cmd
+        return None
     
-    python_cmd = get_python_command(venv_path)
-    if not python_cmd or not python_cmd.exists():
-        print("❌ 无法找到虚拟环境中的Python")
+    if not python_cmd.exists():
+        print("❌ 无法找到虚拟环境中的Python", file=sys.stderr)
         return None
     
     return python_cmd
 
 
-def get_pip_command(venv_path):
-    """获取虚拟环境中的pip命令路径"""
-    if sys.platform == "win32":
-        return venv_path / "Scripts" / "pip.exe"
-    else:
-        return venv_path / "bin" / "pip"
-
-
 def main():
     """主函数"""
     # 检查虚拟环境
@@ -5,11 +5,22 @@
 设置虚拟环境并安装依赖
 """
 
+import argparse
+import hashlib
+import json
 import os
 import sys
 import subprocess
 from pathlib import Path
 
+SCRIPT_DIR = Path(__file__).parent
+
+# 默认的本地 wheel 缓存目录（由 --build-wheelhouse 生成，可离线安装）
+DEFAULT_WHEELHOUSE = SCRIPT_DIR / "wheelhouse"
+
+# 安装完成标记，记录依赖文件的哈希，重复运行时内容未变化则跳过安装
+MARKER_NAME = ".setup_complete.json"
+
 
 def get_venv_path():
     """获取虚拟环境路径"""
@@ -60,14 +71,142 @@ def check_python_version():
     return True
 
 
-def install_requirements(venv_path, install_funasr=False):
-    """安装依赖"""
+def get_requirement_files(install_funasr=False, install_onnx=False):
+    """返回本次需要安装的依赖文件列表"""
+    files = [SCRIPT_DIR / "requirements.txt"]
+    if install_funasr:
+        files.append(SCRIPT_DIR / "requirements-funasr.txt")
+    if install_onnx:
+        files.append(SCRIPT_DIR / "requirements-onnx.txt")
+    return files
+
+
+def get_lock_file(install_funasr=False, install_onnx=False):
+    """返回与本次依赖组合对应的锁定文件路径（由 --freeze 生成）"""
+    name = "requirements"
+    if install_funasr:
+        name += "-funasr"
+    if install_onnx:
+        name += "-onnx"
+    return SCRIPT_DIR / f"{name}.lock"
+
+
+def _requirements_digest(files):
+    """计算依赖文件内容的哈希（包括 -r 引用的文件），用于判断是否需要重新安装"""
+    digest = hashlib.sha256()
+    seen = set()
+    pending = list(files)
+    while pending:
+        path = Path(pending.pop(0)).resolve()
+        if path in seen or not path.exists():
+            continue
+        seen.add(path)
+        content = path.read_bytes()
+        digest.update(path.name.encode("utf-8"))
+        digest.update(content)
+        for line in content.decode("utf-8").splitlines():
+            line = line.strip()
+            if line.startswith("-r "):
+                pending.append(path.parent / line[3:].strip())
+    digest.update(f"{sys.version_info.major}.{sys.version_info.minor}".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def get_install_files(install_funasr=False, install_onnx=False):
+    """返回本次实际用于安装的文件（有锁定文件时只用锁定文件）及其哈希"""
+    lock_file = get_lock_file(install_funasr, install_onnx)
+    files = [lock_file] if lock_file.exists() else get_requirement_files(install_funasr, install_onnx)
+    return files, _requirements_digest(files)
+
+
+def read_marker(venv_path):
+    """读取安装完成标记"""
+    marker = venv_path / MARKER_NAME
+    if not marker.exists():
+        return {}
+    try:
+        return json.loads(marker.read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def is_up_to_date(venv_path, install_funasr=None, install_onnx=False):
+    """安装完成标记中的哈希与当前依赖文件一致时返回 True
+
+    install_funasr 为 None 时沿用标记中记录的选择；没有标记时返回 False。
+    """
+    marker = read_marker(venv_path)
+    if not marker:
+        return False
+    if install_funasr is None:
+        install_funasr = marker.get("funasr", False)
+        install_onnx = install_onnx or marker.get("onnx", False)
+    _, digest = get_install_files(install_funasr, install_onnx)
+    return marker.get("digest") == digest
+
+
+def write_marker(venv_path, digest, install_funasr, install_onnx):
+    """写入安装完成标记"""
+    marker = venv_path / MARKER_NAME
+    marker.write_text(json.dumps({
+        "digest": digest,
+        "funasr": install_funasr,
+        "onnx": install_onnx,
+    }, indent=2), encoding="utf-8")
+
+
+def build_wheelhouse(venv_path, wheelhouse, install_funasr=False, install_onnx=False):
+    """下载所有依赖的 wheel 到本地目录，之后可以离线安装"""
+    pip_cmd = get_pip_command(venv_path)
+    lock_file = get_lock_file(install_funasr, install_onnx)
+    files = [lock_file] if lock_file.exists() else get_requirement_files(install_funasr, install_onnx)
+    cmd = [str(pip_cmd), "download", "--disable-pip-version-check", "--dest", str(wheelhouse)]
+    for path in files:
+        cmd += ["-r", str(path)]
+    print(f"正在下载依赖到本地缓存: {wheelhouse}")
+    try:
+        subprocess.run(cmd, check=True)
+        print("✅ 本地 wheel 缓存已生成")
+        return True
+    except subprocess.CalledProcessError as e:
+        print(f"❌ 下载依赖失败: {e}")
+        return False
+
+
+def freeze_requirements(venv_path, install_funasr=False, install_onnx=False):
+    """将虚拟环境中已安装的精确版本写入锁定文件"""
+    pip_cmd = get_pip_command(venv_path)
+    lock_file = get_lock_file(install_funasr, install_onnx)
+    result = subprocess.run(
+        [str(pip_cmd), "freeze", "--disable-pip-version-check", "--exclude-editable"],
+        check=True,
+        capture_output=True,
+        text=True
+    )
+    lock_file.write_text(result.stdout, encoding="utf-8")
+    print(f"✅ 已生成锁定文件: {lock_file}")
+    return lock_file
+
+
+def install_requirements(venv_path, install_funasr=False, install_onnx=False, wheelhouse=None,
+                         offline=False, upgrade_pip=False, force=False):
+    """安装依赖
+
+    所有依赖在一次 pip 调用中完成解析和安装；存在锁定文件时按锁定版本安装。
+    指定 wheelhouse 时优先从本地 wheel 缓存安装，offline=True 时只使用本地缓存。
+    依赖文件未变化且上次安装成功时直接跳过。
+    """
     pip_cmd = get_pip_command(venv_path)
     
-    # 基础依赖
-    requirements = ["requests>=2.20.0", "urllib3>=1.24.0"]
+    files, digest = get_install_files(install_funasr, install_onnx)
+    
+    marker = read_marker(venv_path)
+    if not force and marker.get("digest") == digest:
+        print("✅ 依赖已安装且未变化，跳过安装")
+        return True
     
     if install_funasr:
+        print_funasr_notice()
         # 检查Python版本
         python_cmd = get_python_command(venv_path)
         if python_cmd and python_cmd.exists():
@@ -85,39 +224,44 @@ def install_requirements(venv_path, install_funasr=False):
         
         if not check_python_version():
             print("⚠️  警告: Python版本可能不满足FunASR要求，但将继续尝试安装")
-        
-        # FunASR的前置依赖
-        print("正在安装FunASR前置依赖...")
-        funasr_deps = ["torch>=1.13", "torchaudio"]
-        requirements.extend(funasr_deps)
-        requirements.append("funasr>=1.0.0")
     
-    print(f"正在安装依赖: {', '.join(requirements)}")
+    print(f"正在安装依赖: {', '.join(path.name for path in files)}")
     
     try:
-        # 升级pip
-        print("升级pip...")
-        subprocess.run(
-            [str(pip_cmd), "install", "--upgrade", "pip"],
-            check=True,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE
-        )
-        
-        # 安装依赖
-        for req in requirements:
-            print(f"  安装 {req}...")
+        if upgrade_pip:
+            print("升级pip...")
             subprocess.run(
-                [str(pip_cmd), "install", req],
+                [str(pip_cmd), "install", "--upgrade", "pip"],
                 check=True,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.PIPE
             )
         
+        # 一次 pip 调用完成所有依赖的解析和安装
+        cmd = [str(pip_cmd), "install", "--disable-pip-version-check", "--no-input"]
+        if wheelhouse and Path(wheelhouse).is_dir():
+            cmd += ["--find-links", str(wheelhouse)]
+            if offline:
+                cmd.append("--no-index")
+        elif offline:
+            print(f"❌ 离线安装需要本地 wheel 缓存: {wheelhouse}")
+            return False
+        for path in files:
+            cmd += ["-r", str(path)]
+        subprocess.run(
+            cmd,
+            check=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE
+        )
+        
+        write_marker(venv_path, digest, install_funasr, install_onnx)
         print("✅ 依赖安装成功")
         return True
     except subprocess.CalledProcessError as e:
         print(f"❌ 安装依赖失败: {e}")
+        if e.stderr:
+            print(e.stderr.decode("utf-8", errors="replace")[-2000:])
         if install_funasr:
             print("\n💡 提示: FunASR安装可能需要较长时间，请确保:")
             print("   1. Python版本 >= 3.8")
@@ -126,62 +270,117 @@ def install_requirements(venv_path, install_funasr=False):
         return False
 
 
-def main():
-    """主函数"""
+def ask_yes_no(question, interactive):
+    """交互模式下询问用户，非交互模式下返回 False"""
+    if not interactive:
+        return False
+    return input(question).strip().lower() == 'y'
+
+
+def print_funasr_notice():
+    print("\n⚠️  注意: FunASR需要以下前置依赖:")
+    print("   - Python >= 3.8")
+    print("   - torch >= 1.13")
+    print("   - torchaudio")
+    print("这些依赖将自动安装...\n")
+
+
+def ensure_venv(install_funasr=None, install_onnx=False, recreate=False, wheelhouse=None, offline=False,
+                upgrade_pip=False, force=False, interactive=None):
+    """创建（或复用）虚拟环境并安装依赖，返回是否成功
+
+    install_funasr 为 None 时：交互模式下询问用户；非交互模式下沿用上次的选择（默认不安装）。
+    """
+    if interactive is None:
+        interactive = sys.stdin.isatty()
     venv_path = get_venv_path()
     
     # 检查虚拟环境是否已存在
     if venv_path.exists():
-        print(f"虚拟环境已存在: {venv_path}")
-        response = input("是否重新创建虚拟环境？(y/N): ").strip().lower()
-        if response == 'y':
+        if not recreate and install_funasr is None and interactive:
+            print(f"虚拟环境已存在: {venv_path}")
+            recreate = ask_yes_no("是否重新创建虚拟环境？(y/N): ", interactive)
+        if recreate:
             import shutil
             print("正在删除旧虚拟环境...")
             shutil.rmtree(venv_path)
+    
+    if not venv_path.exists():
+        if not create_venv(venv_path):
+            return False
+    elif not force and is_up_to_date(venv_path, install_funasr, install_onnx):
+        # 依赖未变化时只输出一行，不打印安装提示
+        print("✅ 依赖已安装且未变化，跳过安装")
+        return True
+    else:
+        print(f"使用现有虚拟环境: {venv_path}")
+    
+    if install_funasr is None:
+        marker = read_marker(venv_path)
+        if marker:
+            # 沿用上次安装时的选择
+            install_funasr = marker.get("funasr", False)
+            install_onnx = install_onnx or marker.get("onnx", False)
         else:
-            print("使用现有虚拟环境")
-            # 检查是否需要安装FunASR
-            pip_cmd = get_pip_command(venv_path)
-            try:
-                result = subprocess.run(
-                    [str(pip_cmd), "show", "funasr"],
-                    capture_output=True,
-                    text=True
-                )
-                has_funasr = result.returncode == 0
-            except:
-                has_funasr = False
-            
-            if not has_funasr:
-                response = input("是否安装FunASR（转文字功能需要）？(y/N): ").strip().lower()
-                if response == 'y':
-                    print("\n⚠️  注意: FunASR需要以下前置依赖:")
-                    print("   - Python >= 3.8")
-                    print("   - torch >= 1.13")
-                    print("   - torchaudio")
-                    print("这些依赖将自动安装...\n")
-                    install_requirements(venv_path, install_funasr=True)
-            return 0
+            install_funasr = ask_yes_no("是否安装FunASR（转文字功能需要）？(y/N): ", interactive)
     
-    # 创建虚拟环境
-    if not create_venv(venv_path):
-        return 1
+    return install_requirements(
+        venv_path,
+        install_funasr=install_funasr,
+        install_onnx=install_onnx,
+        wheelhouse=wheelhouse,
+        offline=offline,
+        upgrade_pip=upgrade_pip,
+        force=force,
+    )
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description='设置虚拟环境并安装依赖')
+    funasr_group = parser.add_mutually_exclusive_group()
+    funasr_group.add_argument('--with-funasr', dest='funasr', action='store_true', default=None,
+                              help='安装 FunASR（转文字功能需要）')
+    funasr_group.add_argument('--without-funasr', dest='funasr', action='store_false',
+                              help='不安装 FunASR')
+    parser.add_argument('--with-onnx', action='store_true', help='安装 ONNX Runtime 推理后端依赖')
+    parser.add_argument('--recreate', action='store_true', help='删除并重新创建虚拟环境')
+    parser.add_argument('--non-interactive', '-y', action='store_true', help='不询问，使用参数或默认值')
+    parser.add_argument('--wheelhouse', type=str, default=str(DEFAULT_WHEELHOUSE),
+                        help=f'本地 wheel 缓存目录，存在时优先从中安装，默认为 {DEFAULT_WHEELHOUSE}')
+    parser.add_argument('--offline', action='store_true', help='只从本地 wheel 缓存安装，不访问网络')
+    parser.add_argument('--build-wheelhouse', action='store_true', help='下载所有依赖的 wheel 到本地缓存目录后退出')
+    parser.add_argument('--freeze', action='store_true', help='安装完成后将精确版本写入锁定文件 requirements*.lock')
+    parser.add_argument('--upgrade-pip', action='store_true', help='安装前先升级 pip')
+    parser.add_argument('--force', action='store_true', help='忽略安装完成标记，重新安装依赖')
+    
+    args = parser.parse_args()
+    interactive = sys.stdin.isatty() and not args.non_interactive
     
-    # 询问是否安装FunASR
-    install_funasr = False
-    response = input("是否安装FunASR（转文字功能需要）？(y/N): ").strip().lower()
-    if response == 'y':
-        print("\n⚠️  注意: FunASR需要以下前置依赖:")
-        print("   - Python >= 3.8")
-        print("   - torch >= 1.13")
-        print("   - torchaudio")
-        print("这些依赖将自动安装...\n")
-        install_funasr = True
+    if args.build_wheelhouse:
+        venv_path = get_venv_path()
+        if not venv_path.exists() and not create_venv(venv_path):
+            return 1
+        ok = build_wheelhouse(venv_path, args.wheelhouse, bool(args.funasr), args.with_onnx)
+        return 0 if ok else 1
     
-    # 安装依赖
-    if not install_requirements(venv_path, install_funasr=install_funasr):
+    if not ensure_venv(
+        install_funasr=args.funasr,
+        install_onnx=args.with_onnx,
+        recreate=args.recreate,
+        wheelhouse=args.wheelhouse,
+        offline=args.offline,
+        upgrade_pip=args.upgrade_pip,
+        force=args.force,
+        interactive=interactive,
+    ):
         return 1
     
+    venv_path = get_venv_path()
+    if args.freeze:
+        marker = read_marker(venv_path)
+        freeze_requirements(venv_path, marker.get("funasr", False), marker.get("onnx", False))
+    
     print("\n✅ 虚拟环境设置完成！")
     print(f"虚拟环境位置: {venv_path}")
     print("\n使用方法:")
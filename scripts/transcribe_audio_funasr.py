@@ -7,24 +7,514 @@
 """
 
 import argparse
+import contextlib
 import json
+import re
+import subprocess
 import sys
 import os
 from pathlib import Path
 
-def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", punc_model="ct-punc", output_dir=None):
+# 与时间戳一一对应的识别单元：中文按字，英文/数字按词，标点不占时间戳
+_TOKEN_PATTERN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]|[A-Za-z0-9]+(?:'[A-Za-z]+)?")
+# ct-punc 会添加的标点，用于从加标点文本还原无标点文本
+_PUNCTUATION_PATTERN = re.compile(r"[，。？！、；：,.?!;:]")
+
+SUBTITLE_FORMATS = ('srt', 'vtt', 'json')
+
+# 常驻模型注册表（见 model_registry.py），同一进程内处理多个音频时复用模型
+_REGISTRY = None
+
+
+def _load_sibling(name):
+    """从同目录加载脚本模块（如 model_store）"""
+    module = sys.modules.get(name)
+    if module is None:
+        import importlib.util
+        spec = importlib.util.spec_from_file_location(name, Path(__file__).parent / f'{name}.py')
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        sys.modules[name] = module
+    return module
+
+
+def get_model_registry():
+    """返回进程内共享的模型注册表，内存预算默认取环境变量 DOUYIN_MODEL_MEMORY_MB"""
+    global _REGISTRY
+    if _REGISTRY is None:
+        budget = os.environ.get('DOUYIN_MODEL_MEMORY_MB')
+        _REGISTRY = _load_sibling('model_registry').ModelRegistry(float(budget) if budget else None)
+    return _REGISTRY
+
+
+def configure_model_registry(max_memory_mb=None):
+    """设置模型注册表的内存预算（MB），None 表示不限制"""
+    registry = get_model_registry()
+    registry.max_memory_mb = max_memory_mb
+    return registry
+
+
+def _torch_component(name, model_store=None):
+    """返回单个 FunASR 模型组件的 (注册表key, loader)，同一模型在不同组合间共享"""
+    store = _load_sibling('model_store')
+    # 已预先下载到本地仓库的模型直接使用本地路径，不再查询模型中心
+    path = store.resolve_model_path(name, model_store)
+    
+    def loader():
+        from funasr import AutoModel
+        
+        component = AutoModel(model=path, disable_update=True)  # 禁用更新检查，加快启动
+        return component, _load_sibling('model_registry').torch_model_bytes(component.model)
+    
+    return ('torch', path), loader
+
+
+def _compose_pipeline(asr, vad=None, punc=None):
+    """用已加载的组件拼出 ASR + VAD + 标点的 AutoModel，不复制模型权重"""
+    import copy
+    
+    # AutoModel 的 vad_model/punc_model 属性分别保存 VAD 和标点模型及其配置
+    pipeline = copy.copy(asr)
+    pipeline.kwargs = dict(asr.kwargs)
+    pipeline.vad_model, pipeline.vad_kwargs = (vad.model, dict(vad.kwargs)) if vad else (None, {})
+    pipeline.punc_model, pipeline.punc_kwargs = (punc.model, dict(punc.kwargs)) if punc else (None, {})
+    return pipeline
+
+
+def _get_component(name, model_store=None):
+    """获取单个 FunASR 模型（如只做 VAD 或只加标点时）"""
+    key, loader = _torch_component(name, model_store)
+    return get_model_registry().get_component(key, loader)
+
+
+def _get_model(model, vad_model, punc_model, model_store=None):
+    """获取 FunASR 模型组合，各组件由模型注册表共享并按内存预算淘汰"""
+    parts = [_torch_component(name, model_store) if name else (None, None) for name in (model, vad_model, punc_model)]
+    pipeline_key = ('torch-pipeline',) + tuple(part_key for part_key, _ in parts)
+    return get_model_registry().get_pipeline(pipeline_key, parts, _compose_pipeline)
+
+
+def _make_segment(text, timestamp, start=None, end=None):
+    """构造一个带时间信息的片段，timestamp 为 [[开始毫秒, 结束毫秒], ...]"""
+    timestamp = [
+        list(pair[:2]) for pair in (timestamp or [])
+        if isinstance(pair, (list, tuple)) and len(pair) >= 2
+    ]
+    if start is None:
+        start = timestamp[0][0] if timestamp else 0
+    if end is None:
+        end = timestamp[-1][1] if timestamp else start
+    tokens = _TOKEN_PATTERN.findall(text or '')
+    if len(tokens) == len(timestamp):
+        words = [[pair[0], pair[1], token] for pair, token in zip(timestamp, tokens)]
+    else:
+        # 分词结果与时间戳数量对不上时只保留时间
+        words = [[pair[0], pair[1], None] for pair in timestamp]
+    return {
+        "text": (text or '').strip(),
+        "start": int(start),
+        "end": int(end),
+        "words": words,
+    }
+
+
+def collect_segments(result):
+    """一次遍历 FunASR 返回结果，收集所有条目的文本、时间戳和句子/字级别片段"""
+    texts = []
+    timestamp_info = []
+    segments = []
+    items = result if isinstance(result, list) else [result]
+    for item in items:
+        if isinstance(item, dict):
+            item_text = item.get('text', '')
+            if item_text:
+                texts.append(item_text)
+            item_timestamp = item.get('timestamp') or []
+            timestamp_info.extend(item_timestamp)
+            sentences = item.get('sentence_info') or []
+            if sentences:
+                for sentence in sentences:
+                    segments.append(_make_segment(
+                        sentence.get('text', ''),
+                        sentence.get('timestamp'),
+                        sentence.get('start'),
+                        sentence.get('end'),
+                    ))
+            elif item_text and item_timestamp:
+                segments.append(_make_segment(item_text, item_timestamp))
+        elif isinstance(item, str):
+            texts.append(item)
+        elif item is not None:
+            texts.append(str(item))
+    return ' '.join(texts), timestamp_info, segments
+
+
+def _join_tokens(tokens):
+    """拼接字词，相邻的英文/数字之间保留空格"""
+    text = ''
+    for token in tokens:
+        if text and text[-1].isascii() and text[-1].isalnum() and token[0].isascii() and token[0].isalnum():
+            text += ' '
+        text += token
+    return text
+
+
+def _words_to_segment(words):
+    """由连续的字级时间戳 [[开始, 结束, 字词], ...] 构造片段"""
+    return {
+        "text": _join_tokens([word[2] for word in words]),
+        "start": int(words[0][0]),
+        "end": int(words[-1][1]),
+        "words": [list(word) for word in words],
+    }
+
+
+def split_segments_by_pause(segments, max_gap_ms=500, max_words=24):
+    """按字间停顿切分无标点的片段，避免没有句子信息时整段只有一条字幕
+
+    相邻两个字的间隔不小于 max_gap_ms 或一条超过 max_words 个字时切开；字词与时间戳对不上的片段原样保留。
     """
-    使用 FunASR 进行语音识别
+    result = []
+    for segment in segments or []:
+        words = segment.get('words') or []
+        if not words or any(word[2] is None for word in words):
+            result.append(segment)
+            continue
+        current = [words[0]]
+        for word in words[1:]:
+            if word[0] - current[-1][1] >= max_gap_ms or len(current) >= max_words:
+                result.append(_words_to_segment(current))
+                current = []
+            current.append(word)
+        result.append(_words_to_segment(current))
+    return result
+
+
+def resegment_punctuated(text, segments):
+    """批量补标点后按标点把字级时间戳重新切成句子（与 FunASR 的 sentence_info 一样在每个标点处断句）
+
+    标点文本中的字词与片段中的字级时间戳数量对不上时返回原片段。
+    """
+    words = [word for segment in segments or [] for word in segment.get('words') or []]
+    pieces = re.findall(f"{_TOKEN_PATTERN.pattern}|{_PUNCTUATION_PATTERN.pattern}", text or '')
+    if not words or any(word[2] is None for word in words) \
+            or sum(1 for piece in pieces if _TOKEN_PATTERN.fullmatch(piece)) != len(words):
+        return segments
+
+    # 每个字词后跟着的标点，遇到标点后的下一个字开始新句
+    result = []
+    current = []
+    tail = ''
+    words = iter(words)
+    for piece in pieces + ['']:
+        if tail and (not piece or _TOKEN_PATTERN.fullmatch(piece)):
+            segment = _words_to_segment(current)
+            segment['text'] += tail
+            result.append(segment)
+            current, tail = [], ''
+        if _TOKEN_PATTERN.fullmatch(piece):
+            current.append(next(words))
+        elif piece and current:
+            tail += piece
+    if current:
+        result.append(_words_to_segment(current))
+    return result
+
+
+def _format_time(ms, separator):
+    """毫秒转为字幕时间格式 HH:MM:SS,mmm"""
+    ms = max(0, int(ms))
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}{separator}{ms:03d}"
+
+
+def segments_to_srt(segments):
+    """片段列表转为 SRT 字幕"""
+    blocks = []
+    for index, segment in enumerate(segments, 1):
+        blocks.append(
+            f"{index}\n{_format_time(segment['start'], ',')} --> {_format_time(segment['end'], ',')}\n{segment['text']}\n"
+        )
+    return '\n'.join(blocks)
+
+
+def segments_to_vtt(segments):
+    """片段列表转为 WebVTT 字幕"""
+    blocks = ['WEBVTT\n']
+    for segment in segments:
+        blocks.append(
+            f"{_format_time(segment['start'], '.')} --> {_format_time(segment['end'], '.')}\n{segment['text']}\n"
+        )
+    return '\n'.join(blocks)
+
+
+def segments_to_json(text, segments):
+    """紧凑 JSON：{"text": ..., "segments": [[开始, 结束, 文本, [[开始, 结束, 字词], ...]], ...]}"""
+    payload = {
+        "text": text,
+        "segments": [[seg['start'], seg['end'], seg['text'], seg['words']] for seg in segments],
+    }
+    return json.dumps(payload, ensure_ascii=False, separators=(',', ':'))
+
+
+def write_subtitle_files(data, base_path, formats=SUBTITLE_FORMATS):
+    """根据识别结果写出字幕文件，返回 {格式: 文件路径}；没有时间信息时不写文件"""
+    segments = data.get('segments') or []
+    if not segments:
+        return {}
+    base_path = Path(base_path)
+    writers = {
+        'srt': lambda: segments_to_srt(segments),
+        'vtt': lambda: segments_to_vtt(segments),
+        'json': lambda: segments_to_json(data.get('text', ''), segments),
+    }
+    paths = {}
+    for fmt in formats:
+        if fmt not in writers:
+            continue
+        # json 使用 .words.json 后缀，避免与其他结果文件混淆
+        path = base_path.with_suffix('.words.json' if fmt == 'json' else f'.{fmt}')
+        path.write_text(writers[fmt](), encoding='utf-8')
+        paths[fmt] = str(path)
+    return paths
+
+
+def load_audio_pcm(audio_path, sample_rate=16000):
+    """使用 FFmpeg 将音视频文件解码为单声道 float32 波形（numpy 数组）"""
+    import numpy as np
     
-    Args:
-        audio_path: 音频文件路径
-        model: ASR 模型，默认为 paraformer-zh
-        vad_model: VAD 模型，默认为 fsmn-vad
-        punc_model: 标点恢复模型，默认为 ct-punc
+    cmd = [
+        "ffmpeg", "-nostdin", "-v", "error",
+        "-i", str(audio_path),
+        "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "-",
+    ]
+    result = subprocess.run(cmd, capture_output=True, check=True)
+    return np.frombuffer(result.stdout, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+@contextlib.contextmanager
+def _onnx_inter_op_threads(inter_op_threads):
+    """funasr_onnx 没有暴露 inter_op 线程数，创建会话期间临时设置 SessionOptions"""
+    if not inter_op_threads:
+        yield
+        return
+    try:
+        from funasr_onnx.utils import utils as onnx_utils
+        from onnxruntime import ExecutionMode
+    except ImportError:
+        yield
+        return
+    
+    original = onnx_utils.SessionOptions
+    
+    def session_options():
+        options = original()
+        options.inter_op_num_threads = inter_op_threads
+        if inter_op_threads > 1:
+            # 只有并行执行模式下 inter_op 线程才会生效
+            options.execution_mode = ExecutionMode.ORT_PARALLEL
+        return options
+    
+    onnx_utils.SessionOptions = session_options
+    try:
+        yield
+    finally:
+        onnx_utils.SessionOptions = original
+
+
+# 需要传入热词的 funasr_onnx ASR 类（模型带热词偏置网络，导出为 model_eb.onnx + model.onnx）
+_HOTWORD_ONNX_CLASSES = ('SeacoParaformer', 'ContextualParaformer')
+
+
+def onnx_asr_class_name(model, model_store=None):
+    """根据模型类型选择 funasr_onnx 的 ASR 类名
+
+    SeACo-Paraformer（如 paraformer-zh 对应的 speech_seaco_paraformer）必须用 SeacoParaformer 加载，
+    contextual 热词模型用 ContextualParaformer，其余用普通的 Paraformer。
+    """
+    store = _load_sibling('model_store')
+    path = store.resolve_model_path(model, model_store)
+    identity = f"{store.get_model_id(model)} {path}".lower()
+    if 'seaco' in identity:
+        return 'SeacoParaformer'
+    if 'contextual' in identity:
+        return 'ContextualParaformer'
+    return 'Paraformer'
+
+
+def _get_onnx_models(model, vad_model, punc_model, model_store=None, quantize=True,
+                     intra_op_threads=4, inter_op_threads=None):
+    """获取 ONNX Runtime 版本的 ASR/VAD/标点模型（funasr_onnx），未指定的模型返回 None"""
+    import funasr_onnx
+    from funasr_onnx import Fsmn_vad, CT_Transformer
+    
+    store = _load_sibling('model_store')
+    options = {"quantize": quantize, "intra_op_num_threads": intra_op_threads or 4}
+    
+    def component(model_class, name, **extra):
+        if not name:
+            return None, None
+        path = store.resolve_model_path(name, model_store)
+        # 本地仓库中没有时使用 ModelScope 模型ID，funasr_onnx 会自动下载并导出 ONNX
+        model_dir = path if os.path.isdir(path) else store.get_model_id(name)
+        
+        def loader():
+            with _onnx_inter_op_threads(inter_op_threads):
+                session = model_class(model_dir, **extra, **options)
+            # 以模型文件大小估算内存占用（SeACo 模型还有 model_eb.onnx）
+            files = Path(model_dir).glob('model*.onnx') if os.path.isdir(model_dir) else []
+            size = sum(f.stat().st_size for f in files if f.name.endswith('_quant.onnx') == quantize)
+            return session, size
+        
+        key = ('onnx', model_class.__name__, model_dir, quantize, intra_op_threads, inter_op_threads)
+        return key, loader
+    
+    asr_class = getattr(funasr_onnx, onnx_asr_class_name(model, model_store)) if model else None
+    parts = [
+        component(asr_class, model, batch_size=1),
+        component(Fsmn_vad, vad_model),
+        component(CT_Transformer, punc_model),
+    ]
+    pipeline_key = ('onnx-pipeline',) + tuple(part_key for part_key, _ in parts)
+    return get_model_registry().get_pipeline(pipeline_key, parts, lambda *models: models)
+
+
+def _transcribe_onnx(audio_path, model, vad_model, punc_model, model_store=None, quantize=True,
+                     intra_op_threads=4, inter_op_threads=None, sample_rate=16000, hotwords=None):
+    """使用 ONNX Runtime 后端识别，返回与 PyTorch 后端相同结构的结果"""
+    asr, vad, punc = _get_onnx_models(
+        model, vad_model, punc_model, model_store, quantize, intra_op_threads, inter_op_threads
+    )
+    asr_kwargs = {}
+    if type(asr).__name__ in _HOTWORD_ONNX_CLASSES:
+        # 热词模型必须传 hotwords，多个热词用空格分隔，没有热词时传空串
+        asr_kwargs["hotwords"] = ' '.join((hotwords or '').split())
+    waveform = load_audio_pcm(audio_path, sample_rate)
+    samples_per_ms = sample_rate // 1000
+    
+    # VAD 切分语音段（毫秒），没有 VAD 模型时整段识别
+    vad_segments = [[0, len(waveform) // samples_per_ms]]
+    if vad is not None:
+        vad_result = vad(waveform)
+        if vad_result and isinstance(vad_result[0], list) and vad_result[0] and isinstance(vad_result[0][0], list):
+            vad_result = vad_result[0]
+        vad_segments = [list(seg[:2]) for seg in vad_result or [] if len(seg) >= 2]
+    
+    items = []
+    for start, end in vad_segments:
+        chunk = waveform[start * samples_per_ms:end * samples_per_ms]
+        if len(chunk) == 0:
+            continue
+        for pred in asr(chunk, **asr_kwargs):
+            text = pred.get('preds', '')
+            if isinstance(text, (list, tuple)):
+                text = text[0] if text else ''
+            text = text.strip()
+            if not text:
+                continue
+            # 语音段内的时间戳是相对时间，加上语音段起点
+            timestamp = [[start + ts[0], start + ts[1]] for ts in pred.get('timestamp') or []]
+            if punc is not None:
+                text = punc(text)[0]
+            items.append({'text': text, 'timestamp': timestamp, 'start': start, 'end': end})
     
+    # 加了标点的语音段直接拼接，否则用空格分隔
+    text = ('' if punc is not None else ' ').join(item['text'] for item in items).strip()
+    timestamp_info = [ts for item in items for ts in item['timestamp']]
+    segments = [_make_segment(item['text'], item['timestamp'], item['start'], item['end']) for item in items]
+    if not text:
+        return {
+            "code": "ERROR",
+            "message": "ONNX 后端返回空文本"
+        }
+    return {
+        "code": "SUCCESS",
+        "data": {
+            "text": text,
+            "audio_path": audio_path,
+            "model": model,
+            "backend": "onnx",
+            "timestamp": timestamp_info if timestamp_info else None,
+            "segments": segments
+        }
+    }
+
+
+def _energy_speech_segments(waveform, sample_rate=16000, frame_ms=30, min_frames=3):
+    """基于能量的简易语音检测，返回 [[开始毫秒, 结束毫秒], ...]（没有 VAD 模型时的兜底方案）"""
+    import numpy as np
+    
+    frame_size = sample_rate * frame_ms // 1000
+    frame_count = len(waveform) // frame_size
+    if frame_count == 0:
+        return []
+    frames = waveform[:frame_count * frame_size].reshape(frame_count, frame_size)
+    energy_db = 10 * np.log10(np.mean(frames ** 2, axis=1) + 1e-10)
+    # 阈值取底噪以上 12dB，且不低于 -50dBFS
+    threshold = max(float(np.percentile(energy_db, 10)) + 12.0, -50.0)
+    active = energy_db > threshold
+    
+    segments = []
+    start = None
+    for index, is_active in enumerate(list(active) + [False]):
+        if is_active and start is None:
+            start = index
+        elif not is_active and start is not None:
+            # 过短的能量突变（点击声等）不计入
+            if index - start >= min_frames:
+                segments.append([start * frame_ms, index * frame_ms])
+            start = None
+    return segments
+
+
+def measure_speech(audio_path, vad_model="fsmn-vad", model_store=None, backend="torch", sample_rate=16000,
+                   quantize=True, intra_op_threads=4, inter_op_threads=None):
+    """只运行 VAD 快速统计音频中的人声时长，不做语音识别
+
+    优先使用 VAD 模型（fsmn-vad），VAD 模型不可用时退回基于能量的检测。
+    onnx 后端的 quantize 和线程数需与识别时一致，才能复用注册表中同一个 VAD 会话。
+
     Returns:
-        dict: 包含识别结果的字典
+        dict: {"speech_seconds": 人声时长, "segments": [[开始毫秒, 结束毫秒], ...], "method": "vad" 或 "energy"}
     """
+    segments = None
+    method = "vad"
+    if vad_model:
+        try:
+            if backend == "onnx":
+                _, vad, _ = _get_onnx_models(
+                    None, vad_model, None, model_store, quantize, intra_op_threads, inter_op_threads
+                )
+                result = vad(load_audio_pcm(audio_path, sample_rate))
+                if result and isinstance(result[0], list) and result[0] and isinstance(result[0][0], list):
+                    result = result[0]
+                segments = result or []
+            else:
+                result = _get_component(vad_model, model_store).generate(input=audio_path)
+                segments = []
+                for item in result or []:
+                    if isinstance(item, dict):
+                        segments.extend(item.get('value') or [])
+        except ImportError:
+            segments = None
+    if segments is None:
+        method = "energy"
+        segments = _energy_speech_segments(load_audio_pcm(audio_path, sample_rate), sample_rate)
+    
+    segments = [list(seg[:2]) for seg in segments if len(seg) >= 2 and seg[0] >= 0 and seg[1] > seg[0]]
+    speech_ms = sum(end - start for start, end in segments)
+    return {
+        "speech_seconds": round(speech_ms / 1000.0, 3),
+        "segments": segments,
+        "method": method,
+    }
+
+def _transcribe(audio_path, model, vad_model, punc_model, output_dir, model_store, backend, quantize,
+                intra_op_threads, inter_op_threads, min_speech_seconds, hotwords=None):
+    """执行语音识别，punc_model 为 None 时不加标点（参数说明见 transcribe_audio）"""
     try:
         # 检查音频文件是否存在
         if not os.path.exists(audio_path):
@@ -41,58 +531,78 @@ def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", pu
                 "message": "音频文件为空"
             }
         
+        # 人声预检：纯音乐或静音的视频直接跳过语音识别
+        if min_speech_seconds and min_speech_seconds > 0:
+            try:
+                speech = measure_speech(
+                    audio_path, vad_model, model_store, backend,
+                    quantize=quantize, intra_op_threads=intra_op_threads, inter_op_threads=inter_op_threads
+                )
+            except Exception as e:
+                import warnings
+                warnings.warn(f"人声检测失败: {e}，继续进行语音识别")
+                speech = None
+            if speech is not None and speech["speech_seconds"] < min_speech_seconds:
+                return {
+                    "code": "NO_SPEECH",
+                    "message": f"未检测到足够的人声（{speech['speech_seconds']} 秒），已跳过语音识别",
+                    "data": {
+                        "text": "",
+                        "audio_path": audio_path,
+                        "model": model,
+                        "speech_seconds": speech["speech_seconds"],
+                        "timestamp": None,
+                        "segments": []
+                    }
+                }
+        
+        # ONNX Runtime 后端（纯CPU推理，量化模型速度更快、内存占用更小）
+        if backend == "onnx":
+            try:
+                return _transcribe_onnx(
+                    audio_path, model, vad_model, punc_model, model_store,
+                    quantize, intra_op_threads, inter_op_threads, hotwords=hotwords
+                )
+            except ImportError:
+                return {
+                    "code": "ERROR",
+                    "message": "ONNX 后端依赖未安装。请先安装：pip install funasr-onnx onnxruntime numpy"
+                }
+            except subprocess.CalledProcessError as e:
+                stderr = (e.stderr or b'').decode('utf-8', errors='replace').strip()
+                return {
+                    "code": "ERROR",
+                    "message": f"FFmpeg 解码音频失败: {stderr or e}"
+                }
+            except Exception as e:
+                return {
+                    "code": "ERROR",
+                    "message": f"ONNX 后端识别失败: {str(e)}"
+                }
+        
         # 方法1：使用 FunASR Python API（推荐，符合官方文档）
         try:
-            from funasr import AutoModel
-            
             # 初始化模型（参考官方文档）
-            # 注意：首次运行会下载模型，可能需要较长时间
-            # 使用 disable_update=True 可以禁用更新检查，加快启动速度
-            asr_model = AutoModel(
-                model=model,
-                vad_model=vad_model,
-                punc_model=punc_model,
-                disable_update=True  # 禁用更新检查，加快启动
-            )
+            # 注意：首次运行会下载模型，可能需要较长时间；可先运行 model_store.py fetch 预先下载
+            asr_model = _get_model(model, vad_model, punc_model, model_store)
             
             # 执行识别（参考官方文档的标准用法）
             # 如果指定了输出目录，可以保存中间结果
             generate_kwargs = {"input": audio_path}
+            if punc_model:
+                # 同一次推理中按标点切分句子并返回句子级时间戳，不需要再跑一遍
+                generate_kwargs["sentence_timestamp"] = True
+            if hotwords:
+                generate_kwargs["hotword"] = hotwords
             if output_dir:
                 generate_kwargs["output_dir"] = output_dir
             
             result = asr_model.generate(**generate_kwargs)
             
             # 解析结果（根据官方文档，返回格式是列表，每个元素是字典）
-            # 格式: [{'key': 'filename', 'text': '识别的文本', 'timestamp': [...]}, ...]
-            text = ""
-            timestamp_info = []
-            
-            if isinstance(result, list) and len(result) > 0:
-                # 提取所有文本片段并合并
-                texts = []
-                for item in result:
-                    if isinstance(item, dict):
-                        item_text = item.get('text', '')
-                        if item_text:
-                            texts.append(item_text)
-                        # 保存时间戳信息（如果有）
-                        if 'timestamp' in item:
-                            timestamp_info = item.get('timestamp', [])
-                    elif isinstance(item, str):
-                        texts.append(item)
-                # 合并文本，使用空格连接
-                text = ' '.join(texts) if texts else ''
-            elif isinstance(result, dict):
-                # 如果是字典格式，直接提取
-                text = result.get('text', '')
-                timestamp_info = result.get('timestamp', [])
-            elif isinstance(result, str):
-                # 如果是字符串，直接使用
-                text = result
-            else:
-                # 其他情况，转换为字符串
-                text = str(result)
+            # 格式: [{'key': 'filename', 'text': '识别的文本', 'timestamp': [...], 'sentence_info': [...]}, ...]
+            # 保留所有条目的时间戳和句子信息，而不是只保留最后一条
+            text, timestamp_info, segments = collect_segments(result)
             
             if text and text.strip():
                 return {
@@ -101,7 +611,8 @@ def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", pu
                         "text": text.strip(),
                         "audio_path": audio_path,
                         "model": model,
-                        "timestamp": timestamp_info if timestamp_info else None
+                        "timestamp": timestamp_info if timestamp_info else None,
+                        "segments": segments
                     }
                 }
             else:
@@ -125,8 +636,6 @@ def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", pu
             # 继续执行下面的命令行方式代码
         
         # 方法2：使用命令行方式（备用）
-        import subprocess
-        
         # 查找 funasr 命令（优先使用虚拟环境中的）
         venv_funasr = Path(__file__).parent / "venv" / "bin" / "funasr"
         if venv_funasr.exists():
@@ -134,14 +643,16 @@ def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", pu
         else:
             funasr_cmd = "funasr"
         
-        # 构建命令参数
+        # 构建命令参数（同样优先使用本地模型仓库中的路径）
+        store = _load_sibling('model_store')
         cmd = [
             funasr_cmd,
-            f"++model={model}",
-            f'++vad_model="{vad_model}"',
-            f'++punc_model="{punc_model}"',
+            f"++model={store.resolve_model_path(model, model_store)}",
+            f'++vad_model="{store.resolve_model_path(vad_model, model_store)}"',
             f"++input={audio_path}"
         ]
+        if punc_model:
+            cmd.insert(3, f'++punc_model="{store.resolve_model_path(punc_model, model_store)}"')
         
         # 执行命令
         result = subprocess.run(
@@ -221,6 +732,76 @@ def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", pu
             "message": f"语音识别异常: {str(e)}"
         }
 
+
+def transcribe_audio(audio_path, model="paraformer-zh", vad_model="fsmn-vad", punc_model="ct-punc", output_dir=None,
+                     model_store=None, backend="torch", quantize=True, intra_op_threads=4, inter_op_threads=None,
+                     min_speech_seconds=0.0, punc_mode="inline", hotwords=None):
+    """
+    使用 FunASR 进行语音识别
+    
+    Args:
+        audio_path: 音频文件路径
+        model: ASR 模型，默认为 paraformer-zh
+        vad_model: VAD 模型，默认为 fsmn-vad
+        punc_model: 标点恢复模型，默认为 ct-punc
+        model_store: 本地模型仓库目录，默认为 scripts/models（见 model_store.py）
+        backend: 推理后端，torch（FunASR AutoModel）或 onnx（ONNX Runtime，适合纯CPU机器）
+        quantize: onnx 后端是否使用量化模型
+        intra_op_threads / inter_op_threads: onnx 后端的算子内/算子间线程数
+        min_speech_seconds: 大于 0 时先用 VAD 统计人声时长，低于该值直接返回 NO_SPEECH，不运行语音识别
+        punc_mode: 标点恢复方式，inline（识别时一起完成）、defer（先返回无标点文本，
+            之后用 punctuate_texts() 批量补标点）或 none（不加标点）
+        hotwords: 热词，多个用空格分隔，仅 SeACo/contextual 热词模型生效（如默认的 paraformer-zh）
+    
+    Returns:
+        dict: 包含识别结果的字典，data 中 raw_text 为无标点文本，punctuated 表示 text 是否已加标点
+    """
+    inline_punc = punc_model if punc_mode == "inline" else None
+    result = _transcribe(
+        audio_path, model, vad_model, inline_punc, output_dir, model_store, backend, quantize,
+        intra_op_threads, inter_op_threads, min_speech_seconds, hotwords
+    )
+    data = result.get("data")
+    if data is not None:
+        punctuated = bool(inline_punc)
+        data["raw_text"] = _PUNCTUATION_PATTERN.sub('', data.get("text", "")) if punctuated else data.get("text", "")
+        data["punctuated"] = punctuated
+        if not punctuated and data.get("segments"):
+            # 没有标点就没有句子信息，按停顿切分字幕；defer 模式补标点后用 resegment_punctuated() 重新断句
+            data["segments"] = split_segments_by_pause(data["segments"])
+    return result
+
+
+def punctuate_texts(texts, punc_model="ct-punc", model_store=None, backend="torch", quantize=True,
+                    intra_op_threads=4, inter_op_threads=None):
+    """批量为多段无标点文本恢复标点，只加载一次标点模型并在一次调用中处理所有文本
+
+    Returns:
+        list: 与 texts 一一对应的加标点文本，空文本原样返回
+    """
+    texts = list(texts)
+    indexes = [index for index, text in enumerate(texts) if text and text.strip()]
+    results = list(texts)
+    if not indexes:
+        return results
+    
+    if backend == "onnx":
+        _, _, punc = _get_onnx_models(
+            None, None, punc_model, model_store, quantize, intra_op_threads, inter_op_threads
+        )
+        for index in indexes:
+            results[index] = punc(texts[index])[0]
+        return results
+    
+    punc = _get_component(punc_model, model_store)
+    output = punc.generate(input=[texts[index] for index in indexes])
+    if len(output) != len(indexes):
+        raise RuntimeError(f"标点模型返回 {len(output)} 条结果，输入为 {len(indexes)} 条")
+    for index, item in zip(indexes, output):
+        results[index] = item.get('text', texts[index]) if isinstance(item, dict) else str(item)
+    return results
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='使用 FunASR 进行语音识别')
     parser.add_argument('--audio', type=str, required=True, help='音频文件路径')
@@ -228,17 +809,46 @@ if __name__ == "__main__":
     parser.add_argument('--vad_model', type=str, default='fsmn-vad', help='VAD 模型，默认为 fsmn-vad')
     parser.add_argument('--punc_model', type=str, default='ct-punc', help='标点恢复模型，默认为 ct-punc')
     parser.add_argument('--output_dir', type=str, default=None, help='输出目录（可选）')
+    parser.add_argument('--backend', type=str, choices=['torch', 'onnx'], default='torch', help='推理后端，默认为 torch')
+    parser.add_argument('--no_quantize', action='store_true', help='onnx 后端不使用量化模型')
+    parser.add_argument('--intra_op_threads', type=int, default=4, help='onnx 后端算子内线程数，默认为 4')
+    parser.add_argument('--inter_op_threads', type=int, default=None, help='onnx 后端算子间线程数（可选）')
+    parser.add_argument('--min_speech_seconds', type=float, default=0.0,
+                        help='人声时长低于该值（秒）时跳过语音识别并返回 NO_SPEECH，默认为 0（不检测）')
+    parser.add_argument('--punc_mode', type=str, choices=['inline', 'defer', 'none'], default='inline',
+                        help='标点恢复方式：inline（默认）、defer（返回无标点文本，之后批量补标点）、none（不加标点）')
+    parser.add_argument('--hotwords', type=str, default=None,
+                        help='热词，多个用空格分隔（仅 SeACo/contextual 热词模型生效，可选）')
+    parser.add_argument('--model_memory_mb', type=float, default=None,
+                        help='常驻模型的内存预算（MB），超出时淘汰最久未使用的模型（可选）')
+    parser.add_argument('--model_store', type=str, default=None, help='本地模型仓库目录（可选，默认为 scripts/models）')
+    parser.add_argument('--subtitles', type=str, nargs='*', choices=SUBTITLE_FORMATS, default=[],
+                        help='在音频文件旁写出字幕文件：srt、vtt、json（字级时间戳）')
     
     args = parser.parse_args()
     
+    if args.model_memory_mb:
+        configure_model_registry(args.model_memory_mb)
+    
     result = transcribe_audio(
         args.audio,
         model=args.model,
         vad_model=args.vad_model,
         punc_model=args.punc_model,
-        output_dir=args.output_dir
+        output_dir=args.output_dir,
+        model_store=args.model_store,
+        backend=args.backend,
+        quantize=not args.no_quantize,
+        intra_op_threads=args.intra_op_threads,
+        inter_op_threads=args.inter_op_threads,
+        min_speech_seconds=args.min_speech_seconds,
+        punc_mode=args.punc_mode,
+        hotwords=args.hotwords
     )
     
+    if args.subtitles and result.get('code') == 'SUCCESS':
+        result['data']['subtitle_paths'] = write_subtitle_files(result['data'], args.audio, args.subtitles)
+    
     # 输出 JSON 格式结果
     print(json.dumps(result, ensure_ascii=False))
 
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+转文字结果全文索引
+将转文字文本、标题和作者信息保存到 SQLite FTS5 索引中，按关键词检索，不必再逐个扫描 .txt 文件
+"""
+
+import argparse
+import json
+import re
+import sqlite3
+import sys
+import time
+from pathlib import Path
+
+# 中日韩统一表意文字（含扩展A区和兼容区）
+_CJK = '\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff'
+# 汉字加上中文标点和全角字符，还原空格时这些字符两侧的空格都是分词时插入的
+_CJK_TEXT = _CJK + '\u3000-\u303f\uff00-\uffef'
+_CJK_PATTERN = re.compile(f'([{_CJK}])')
+_SPACES_PATTERN = re.compile(r'\s+')
+# 还原分词时插入的空格（包括 snippet() 高亮标记两侧的空格）
+_JOIN_PATTERN = re.compile(
+    f'(?<=[{_CJK_TEXT}]) (?=[{_CJK_TEXT}])'
+    f'|(?<=[{_CJK_TEXT}]\\]) (?=[{_CJK_TEXT}\\[])'
+    f'|(?<=[{_CJK_TEXT}]) (?=\\[[{_CJK_TEXT}])'
+)
+_MARK_JOIN_PATTERN = re.compile(f'(?<=[{_CJK}])\\]\\[(?=[{_CJK}])')
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS videos (
+    video_id TEXT PRIMARY KEY,
+    url TEXT,
+    title TEXT,
+    author_name TEXT,
+    author_uid TEXT,
+    transcript TEXT,
+    text_path TEXT,
+    video_path TEXT,
+    updated REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS videos_fts USING fts5(title, author, transcript, tokenize='unicode61');
+'''
+
+
+def segment_text(text):
+    """在每个汉字两侧插入空格
+
+    unicode61 分词器会把连续的汉字当成一个词，逐字分开后可以按任意中文短语检索（短语查询要求逐字相邻）。
+    """
+    if not text:
+        return ''
+    return _SPACES_PATTERN.sub(' ', _CJK_PATTERN.sub(r' \1 ', text)).strip()
+
+
+def desegment_text(text):
+    """去掉 segment_text() 插入的空格"""
+    if not text:
+        return ''
+    return _MARK_JOIN_PATTERN.sub('', _JOIN_PATTERN.sub('', text))
+
+
+def build_match_query(query):
+    """将用户输入转换为 FTS5 查询：按空白拆分，每一段作为短语，多段之间为 AND"""
+    terms = [term for term in query.split() if term]
+    phrases = []
+    for term in terms:
+        segmented = segment_text(term).replace('"', '""')
+        if segmented:
+            phrases.append(f'"{segmented}"')
+    return ' AND '.join(phrases)
+
+
+class TranscriptIndex:
+    """转文字结果的全文索引
+
+    videos 表保存原始文本和元数据，videos_fts 保存逐字分词后的文本，两者 rowid 相同。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def upsert(self, video_id, url='', title='', author_name='', author_uid='', transcript='',
+               text_path=None, video_path=None):
+        """新增或更新一个作品的索引，写入后立即提交
+
+        transcript、text_path、video_path 为空时保留索引中已有的值（例如重跑时只解析不转文字）。
+        """
+        with self._conn:
+            self._conn.execute(
+                '''
+                INSERT INTO videos (video_id, url, title, author_name, author_uid, transcript, text_path, video_path, updated)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    url = excluded.url,
+                    title = excluded.title,
+                    author_name = excluded.author_name,
+                    author_uid = excluded.author_uid,
+                    transcript = COALESCE(NULLIF(excluded.transcript, ''), videos.transcript),
+                    text_path = COALESCE(excluded.text_path, videos.text_path),
+                    video_path = COALESCE(excluded.video_path, videos.video_path),
+                    updated = excluded.updated
+                ''',
+                (str(video_id), url, title, author_name, author_uid, transcript, text_path, video_path, time.time()),
+            )
+            row = self._conn.execute(
+                'SELECT rowid, title, author_name, transcript FROM videos WHERE video_id = ?', (str(video_id),)
+            ).fetchone()
+            self._conn.execute('DELETE FROM videos_fts WHERE rowid = ?', (row['rowid'],))
+            self._conn.execute(
+                'INSERT INTO videos_fts (rowid, title, author, transcript) VALUES (?, ?, ?, ?)',
+                (row['rowid'], segment_text(row['title']), segment_text(row['author_name']), segment_text(row['transcript'])),
+            )
+
+    def add_record(self, record):
+        """索引 parse_douyin_video.py 的一条处理记录（process_url() 的返回值或 --jsonl 输出的一行）
+
+        没有解析结果的记录会被忽略，返回是否写入了索引。
+        """
+        result = record.get('result')
+        if result is None:
+            return False
+        if hasattr(result, 'to_dict'):
+            result = result.to_dict()
+        video_id = record.get('video_id') or result.get('video_id')
+        if not video_id:
+            return False
+        author = result.get('author') or {}
+        self.upsert(
+            video_id,
+            url=record.get('url') or '',
+            title=result.get('title') or '',
+            author_name=author.get('name') or '',
+            author_uid=author.get('uid') or '',
+            transcript=record.get('transcript') or '',
+            text_path=record.get('text_path'),
+            video_path=record.get('video_path'),
+        )
+        return True
+
+    def search(self, query, limit=20):
+        """检索标题、作者和转文字文本，按相关度排序返回结果列表"""
+        match_query = build_match_query(query)
+        if not match_query:
+            return []
+        rows = self._conn.execute(
+            '''
+            SELECT videos.video_id, videos.url, videos.title, videos.author_name, videos.text_path, videos.video_path,
+                   snippet(videos_fts, 2, '[', ']', '…', 16) AS snippet
+            FROM videos_fts JOIN videos ON videos.rowid = videos_fts.rowid
+            WHERE videos_fts MATCH ?
+            ORDER BY rank
+            LIMIT ?
+            ''',
+            (match_query, limit),
+        ).fetchall()
+        results = []
+        for row in rows:
+            item = dict(row)
+            item['snippet'] = desegment_text(item['snippet'])
+            results.append(item)
+        return results
+
+    def count(self):
+        return self._conn.execute('SELECT COUNT(*) FROM videos').fetchone()[0]
+
+    def close(self):
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def import_records(index, path):
+    """从 --jsonl 输出的结果文件导入索引，返回导入条数"""
+    imported = 0
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict) and index.add_record(record):
+                imported += 1
+    return imported
+
+
+def main():
+    parser = argparse.ArgumentParser(description='检索已保存的抖音视频转文字结果')
+    parser.add_argument('--db', type=str, required=True, help='索引数据库文件路径')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    search_parser = subparsers.add_parser('search', help='按关键词检索（多个关键词之间为 AND）')
+    search_parser.add_argument('query', type=str, nargs='+', help='关键词')
+    search_parser.add_argument('--limit', type=int, default=20, help='最多返回的条数，默认为 20')
+    search_parser.add_argument('--json', action='store_true', help='以 JSON Lines 输出结果')
+
+    import_parser = subparsers.add_parser('import', help='从 --jsonl 输出的结果文件导入')
+    import_parser.add_argument('files', type=str, nargs='+', help='结果文件（JSON Lines）')
+
+    args = parser.parse_args()
+
+    with TranscriptIndex(args.db) as index:
+        if args.command == 'import':
+            for path in args.files:
+                imported = import_records(index, path)
+                print(f"✅ {path}: 导入 {imported} 条")
+            print(f"索引中共有 {index.count()} 个作品")
+            return 0
+
+        try:
+            results = index.search(' '.join(args.query), args.limit)
+        except sqlite3.OperationalError as e:
+            print(f"❌ 检索失败: {e}", file=sys.stderr)
+            return 1
+        for item in results:
+            if args.json:
+                print(json.dumps(item, ensure_ascii=False, separators=(',', ':')))
+                continue
+            print(f"{item['video_id']}  {item['title']}  @{item['author_name']}")
+            if item['snippet']:
+                print(f"    {item['snippet']}")
+            if item['text_path']:
+                print(f"    {item['text_path']}")
+        if not args.json:
+            print(f"共 {len(results)} 条结果")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,514 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+分布式任务队列
+多台机器共同处理一批链接：worker 租用任务并定期续租，租约过期的任务重新排队；
+任务按作品ID分片，同一作品总是交给负责该分片的节点处理，可以复用该节点上的缓存
+"""
+
+import argparse
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+# 默认租约时长（秒），worker 每隔三分之一租约时长续租一次
+DEFAULT_LEASE_SECONDS = 600
+
+# 任务最多尝试次数，超过后标记为失败，不再排队
+DEFAULT_MAX_ATTEMPTS = 3
+
+SQLITE_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS jobs (
+    key TEXT PRIMARY KEY,
+    video_id TEXT,
+    is_note INTEGER,
+    shard INTEGER,
+    state TEXT,
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER DEFAULT 0,
+    error TEXT,
+    enqueued REAL,
+    updated REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state_shard ON jobs (state, shard, enqueued);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def shard_for(key, shards):
+    """按作品ID（没有时按链接）计算分片号"""
+    if shards <= 1:
+        return 0
+    return zlib.crc32(str(key).encode('utf-8')) % shards
+
+
+def default_worker_id():
+    """默认的 worker 标识：主机名-进程号"""
+    return f'{socket.gethostname()}-{os.getpid()}'
+
+
+class SQLiteQueue:
+    """单机任务队列（SQLite），同一台机器上的多个进程可以共享"""
+
+    def __init__(self, path, shards=None):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.executescript(SQLITE_SCHEMA)
+        # 分片数在第一次创建队列时确定，之后以队列中保存的为准；shards 为 None 时（只查看队列）不写入
+        if shards is not None:
+            self._conn.execute('INSERT OR IGNORE INTO meta (key, value) VALUES (?, ?)', ('shards', str(shards)))
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'shards'").fetchone()
+        self.shards = int(row[0]) if row else 1
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE 事务，多个进程同时租用任务时互斥"""
+        conn = self._conn
+
+        class Transaction:
+            def __enter__(self):
+                conn.execute('BEGIN IMMEDIATE')
+                return conn
+
+            def __exit__(self, exc_type, exc, tb):
+                conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+        return Transaction()
+
+    def enqueue(self, key, video_id=None, is_note=False):
+        """加入任务，已经存在的任务（包括已完成的）不会重复加入，返回是否新加入"""
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            cursor = conn.execute(
+                '''
+                INSERT OR IGNORE INTO jobs (key, video_id, is_note, shard, state, attempts, enqueued, updated)
+                VALUES (?, ?, ?, ?, 'queued', 0, ?, ?)
+                ''',
+                (key, video_id, int(bool(is_note)), shard_for(video_id or key, self.shards), now, now),
+            )
+            return cursor.rowcount > 0
+
+    def lease(self, worker, shards=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """租用一个任务，shards 为该节点负责的分片（None 表示全部），没有可用任务时返回 None"""
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            self._requeue_expired(conn, now, max_attempts)
+            query = "SELECT * FROM jobs WHERE state = 'queued'"
+            params = []
+            if shards is not None:
+                query += f' AND shard IN ({",".join("?" * len(shards))})'
+                params.extend(shards)
+            row = conn.execute(query + ' ORDER BY enqueued LIMIT 1', params).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                '''
+                UPDATE jobs SET state = 'leased', owner = ?, lease_expires = ?, attempts = attempts + 1, updated = ?
+                WHERE key = ?
+                ''',
+                (worker, now + lease_seconds, now, row['key']),
+            )
+            return {
+                'key': row['key'],
+                'video_id': row['video_id'],
+                'is_note': bool(row['is_note']),
+                'shard': row['shard'],
+                'attempts': row['attempts'] + 1,
+            }
+
+    def heartbeat(self, key, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """续租，租约已经不属于该 worker 时返回 False"""
+        now = time.time()
+        with self._lock, self._transaction() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated = ? WHERE key = ? AND owner = ? AND state = 'leased'",
+                (now + lease_seconds, now, key, worker),
+            )
+            return cursor.rowcount > 0
+
+    def complete(self, key, worker):
+        """标记任务完成"""
+        with self._lock, self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET state = 'done', owner = NULL, error = NULL, updated = ? WHERE key = ? AND owner = ?",
+                (time.time(), key, worker),
+            )
+
+    def fail(self, key, worker, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """任务失败：未达到最多尝试次数时重新排队，否则标记为失败"""
+        with self._lock, self._transaction() as conn:
+            conn.execute(
+                '''
+                UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    owner = NULL, error = ?, updated = ?
+                WHERE key = ? AND owner = ?
+                ''',
+                (max_attempts, str(error), time.time(), key, worker),
+            )
+
+    def requeue_expired(self, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """把租约已过期的任务重新排队（worker 崩溃或失联），返回处理的任务数"""
+        with self._lock, self._transaction() as conn:
+            return self._requeue_expired(conn, time.time(), max_attempts)
+
+    def _requeue_expired(self, conn, now, max_attempts):
+        cursor = conn.execute(
+            '''
+            UPDATE jobs SET state = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                owner = NULL, error = '租约过期', updated = ?
+            WHERE state = 'leased' AND lease_expires < ?
+            ''',
+            (max_attempts, now, now),
+        )
+        return cursor.rowcount
+
+    def stats(self):
+        """各状态的任务数"""
+        with self._lock:
+            rows = self._conn.execute('SELECT state, COUNT(*) FROM jobs GROUP BY state').fetchall()
+        return {state: count for state, count in rows}
+
+    def close(self):
+        self._conn.close()
+
+
+class RespError(Exception):
+    """Redis 协议服务端返回的错误"""
+
+
+class RespClient:
+    """最小的 Redis 协议（RESP）客户端，只实现任务队列用到的命令，任何兼容该协议的服务都可以使用"""
+
+    def __init__(self, host='127.0.0.1', port=6379, db=0, password=None, timeout=30):
+        # 可重入锁：事务（WATCH ... EXEC）期间持有，其他线程（如续租）的命令不会插入到事务中间
+        self.lock = threading.RLock()
+        self._sock = socket.create_connection((host, port), timeout=timeout)
+        self._file = self._sock.makefile('rb')
+        if password:
+            self.execute('AUTH', password)
+        if db:
+            self.execute('SELECT', db)
+
+    def execute(self, *args):
+        """发送一条命令并返回解析后的回复"""
+        parts = [f'*{len(args)}\r\n'.encode()]
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode('utf-8')
+            parts.append(f'${len(data)}\r\n'.encode() + data + b'\r\n')
+        with self.lock:
+            self._sock.sendall(b''.join(parts))
+            return self._read_reply()
+
+    def multi(self, commands):
+        """在 MULTI/EXEC 中执行多条命令，返回各命令的回复；WATCH 的键已被其他客户端修改时返回 None
+
+        事务中的命令由服务端一次性全部执行，客户端在 EXEC 之前断开时一条都不会执行。
+        """
+        with self.lock:
+            self.execute('MULTI')
+            try:
+                for command in commands:
+                    self.execute(*command)
+            except RespError:
+                self.execute('DISCARD')
+                raise
+            return self.execute('EXEC')
+
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError('连接已关闭')
+        prefix, payload = line[:1], line[1:-2]
+        if prefix == b'+':
+            return payload.decode('utf-8')
+        if prefix == b'-':
+            raise RespError(payload.decode('utf-8'))
+        if prefix == b':':
+            return int(payload)
+        if prefix == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)[:-2]
+            return data.decode('utf-8')
+        if prefix == b'*':
+            length = int(payload)
+            if length < 0:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RespError(f'无法解析的回复: {line!r}')
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+class RedisQueue:
+    """多机任务队列（Redis 协议）
+
+    每个分片一个待处理列表 {prefix}:queue:{分片}，租约保存在有序集合 {prefix}:leases（分数为过期时间），
+    任务信息保存在哈希 {prefix}:job:{链接}。
+    每次状态变化都在一个 WATCH + MULTI/EXEC 事务中完成，任务不会因为 worker 在中途崩溃或断线而丢失。
+    """
+
+    def __init__(self, client, prefix='douyin', shards=None):
+        self.client = client
+        self.prefix = prefix
+        # shards 为 None 时（只查看队列）不写入分片数
+        if shards is not None:
+            self.client.execute('SETNX', f'{prefix}:shards', shards)
+        self.shards = int(self.client.execute('GET', f'{prefix}:shards') or 1)
+
+    def _job_key(self, key):
+        return f'{self.prefix}:job:{key}'
+
+    def _queue_key(self, shard):
+        return f'{self.prefix}:queue:{shard}'
+
+    def _transaction(self, watch, prepare):
+        """乐观事务：WATCH watch 中的键后调用 prepare() 读取当前状态
+
+        prepare() 返回 None 表示不需要修改，否则返回 (命令列表, 附加值)，命令在 MULTI/EXEC 中执行；
+        被监视的键在此期间被其他客户端修改时重新读取并重试。返回 (附加值, EXEC 的回复)，放弃时返回 (None, None)。
+        """
+        while True:
+            with self.client.lock:
+                self.client.execute('WATCH', *watch)
+                plan = prepare()
+                if plan is None:
+                    self.client.execute('UNWATCH')
+                    return None, None
+                commands, context = plan
+                replies = self.client.multi(commands)
+            if replies is not None:
+                return context, replies
+
+    def enqueue(self, key, video_id=None, is_note=False):
+        """加入任务，已经存在的任务（包括已完成的）不会重复加入，返回是否新加入"""
+        job_key = self._job_key(key)
+        shard = shard_for(video_id or key, self.shards)
+
+        def prepare():
+            if self.client.execute('EXISTS', job_key):
+                return None
+            return [
+                ('HSET', job_key, 'state', 'queued', 'video_id', video_id or '', 'is_note', int(bool(is_note)),
+                 'shard', shard, 'attempts', 0),
+                ('RPUSH', self._queue_key(shard), key),
+            ], True
+
+        added, _ = self._transaction([job_key], prepare)
+        return bool(added)
+
+    def lease(self, worker, shards=None, lease_seconds=DEFAULT_LEASE_SECONDS, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """租用一个任务，shards 为该节点负责的分片（None 表示全部），没有可用任务时返回 None"""
+        self.requeue_expired(max_attempts)
+        for shard in (shards if shards is not None else range(self.shards)):
+            queue_key = self._queue_key(shard)
+
+            def prepare():
+                key = self.client.execute('LINDEX', queue_key, 0)
+                if key is None:
+                    return None
+                job_key = self._job_key(key)
+                # 出队、登记租约和更新任务状态在同一个事务中完成
+                return [
+                    ('LPOP', queue_key),
+                    ('ZADD', f'{self.prefix}:leases', time.time() + lease_seconds, key),
+                    ('HINCRBY', job_key, 'attempts', 1),
+                    ('HSET', job_key, 'state', 'leased', 'owner', worker),
+                    ('HMGET', job_key, 'video_id', 'is_note'),
+                ], key
+
+            key, replies = self._transaction([queue_key], prepare)
+            if key is None:
+                continue
+            video_id, is_note = replies[4]
+            return {
+                'key': key,
+                'video_id': video_id or None,
+                'is_note': is_note == '1',
+                'shard': shard,
+                'attempts': replies[2],
+            }
+        return None
+
+    def heartbeat(self, key, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        """续租，租约已经不属于该 worker 时返回 False"""
+        job_key = self._job_key(key)
+
+        def prepare():
+            if self.client.execute('HGET', job_key, 'owner') != worker:
+                return None
+            return [('ZADD', f'{self.prefix}:leases', 'XX', time.time() + lease_seconds, key)], True
+
+        renewed, _ = self._transaction([job_key], prepare)
+        return bool(renewed)
+
+    def complete(self, key, worker):
+        """标记任务完成"""
+        job_key = self._job_key(key)
+
+        def prepare():
+            if self.client.execute('HGET', job_key, 'owner') != worker:
+                return None
+            return [
+                ('ZREM', f'{self.prefix}:leases', key),
+                ('HSET', job_key, 'state', 'done', 'owner', ''),
+                ('HINCRBY', f'{self.prefix}:stats', 'done', 1),
+            ], True
+
+        self._transaction([job_key], prepare)
+
+    def fail(self, key, worker, error, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """任务失败：未达到最多尝试次数时重新排队，否则标记为失败"""
+        job_key = self._job_key(key)
+
+        def prepare():
+            if self.client.execute('HGET', job_key, 'owner') != worker:
+                return None
+            return self._release_commands(key, str(error), max_attempts), True
+
+        self._transaction([job_key], prepare)
+
+    def requeue_expired(self, max_attempts=DEFAULT_MAX_ATTEMPTS):
+        """把租约已过期的任务重新排队（worker 崩溃或失联），返回处理的任务数"""
+        leases_key = f'{self.prefix}:leases'
+        expired = self.client.execute('ZRANGEBYSCORE', leases_key, '-inf', time.time())
+        count = 0
+        for key in expired or []:
+            def prepare(key=key):
+                # 事务提交前租约仍然过期才重新排队，避免多个 worker 重复处理同一个过期任务
+                score = self.client.execute('ZSCORE', leases_key, key)
+                if score is None or float(score) >= time.time():
+                    return None
+                return self._release_commands(key, '租约过期', max_attempts), True
+
+            released, _ = self._transaction([leases_key, self._job_key(key)], prepare)
+            if released:
+                count += 1
+        return count
+
+    def _release_commands(self, key, error, max_attempts):
+        """释放租约的命令：未达到最多尝试次数时重新排队，否则标记为失败（在事务的 prepare() 中调用）"""
+        job_key = self._job_key(key)
+        attempts, shard = self.client.execute('HMGET', job_key, 'attempts', 'shard')
+        commands = [('ZREM', f'{self.prefix}:leases', key)]
+        if int(attempts or 0) >= max_attempts:
+            commands.append(('HSET', job_key, 'state', 'failed', 'owner', '', 'error', error))
+            commands.append(('HINCRBY', f'{self.prefix}:stats', 'failed', 1))
+        else:
+            commands.append(('HSET', job_key, 'state', 'queued', 'owner', '', 'error', error))
+            commands.append(('RPUSH', self._queue_key(int(shard or 0)), key))
+        return commands
+
+    def stats(self):
+        """各状态的任务数"""
+        queued = sum(self.client.execute('LLEN', self._queue_key(shard)) for shard in range(self.shards))
+        counters = self.client.execute('HGETALL', f'{self.prefix}:stats') or []
+        stats = {'queued': queued, 'leased': self.client.execute('ZCARD', f'{self.prefix}:leases')}
+        stats.update({counters[i]: int(counters[i + 1]) for i in range(0, len(counters), 2)})
+        return stats
+
+    def close(self):
+        self.client.close()
+
+
+def open_queue(spec, shards=None):
+    """按地址打开任务队列：redis://[:密码@]主机[:端口][/库号][?prefix=前缀] 或 SQLite 文件路径（可带 sqlite:// 前缀）
+
+    shards 为新建队列时的分片数；为 None 时只打开已有队列，不确定分片数（如查看统计）。
+    """
+    parsed = urlparse(spec)
+    if parsed.scheme == 'redis':
+        db = int(parsed.path.strip('/') or 0)
+        prefix = 'douyin'
+        for item in parsed.query.split('&'):
+            if item.startswith('prefix='):
+                prefix = item[len('prefix='):]
+        client = RespClient(parsed.hostname or '127.0.0.1', parsed.port or 6379, db, parsed.password)
+        return RedisQueue(client, prefix, shards)
+    if parsed.scheme == 'sqlite':
+        spec = spec[len('sqlite://'):]
+    return SQLiteQueue(spec, shards)
+
+
+def parse_shards(value):
+    """解析 --shards 参数（如 "0,2,4"），为空时返回 None（表示全部分片）"""
+    if not value:
+        return None
+    return [int(item) for item in value.split(',') if item.strip()]
+
+
+class LeaseKeeper:
+    """后台续租线程：为当前 worker 持有的所有任务定期续租"""
+
+    def __init__(self, queue, worker, lease_seconds=DEFAULT_LEASE_SECONDS):
+        self.queue = queue
+        self.worker = worker
+        self.lease_seconds = lease_seconds
+        self._keys = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def add(self, key):
+        with self._lock:
+            self._keys.add(key)
+
+    def remove(self, key):
+        with self._lock:
+            self._keys.discard(key)
+
+    def _run(self):
+        interval = max(1.0, self.lease_seconds / 3)
+        while not self._stop.wait(interval):
+            with self._lock:
+                keys = list(self._keys)
+            for key in keys:
+                try:
+                    if not self.queue.heartbeat(key, self.worker, self.lease_seconds):
+                        print(f'任务租约已失效（可能已被其他节点接手）: {key}', file=sys.stderr)
+                        self.remove(key)
+                except Exception as e:
+                    print(f'续租失败: {str(e)}', file=sys.stderr)
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='查看和维护分布式任务队列（处理任务请使用 parse_douyin_video.py --queue ... --worker）')
+    parser.add_argument('queue', type=str, help='队列地址：SQLite 文件路径或 redis://主机:端口/库号')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('stats', help='各状态的任务数')
+    subparsers.add_parser('requeue', help='立即把租约已过期的任务重新排队')
+
+    args = parser.parse_args()
+
+    queue = open_queue(args.queue)
+    try:
+        if args.command == 'requeue':
+            print(f"重新排队 {queue.requeue_expired()} 个任务")
+        else:
+            print(json.dumps({'shards': queue.shards, **queue.stats()}, ensure_ascii=False))
+    finally:
+        queue.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+
+"""ONNX 后端按模型类型选择 funasr_onnx ASR 类"""
+
+import importlib.util
+import unittest
+from pathlib import Path
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent / 'scripts'
+
+
+def _load_script(name):
+    spec = importlib.util.spec_from_file_location(name, SCRIPTS_DIR / f'{name}.py')
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class OnnxAsrClassTest(unittest.TestCase):
+    def setUp(self):
+        self.transcribe = _load_script('transcribe_audio_funasr')
+        self.empty_store = str(Path(__file__).resolve().parent / 'no-such-store')
+
+    def choose(self, model):
+        return self.transcribe.onnx_asr_class_name(model, self.empty_store)
+
+    def test_aliases(self):
+        cases = {
+            # paraformer-zh 对应 SeACo-Paraformer 热词模型
+            'paraformer-zh': 'SeacoParaformer',
+            'iic/speech_seaco_paraformer_large_asr_nat-zh-cn-16k-common-vocab8404-pytorch': 'SeacoParaformer',
+            'iic/speech_paraformer-large-contextual_asr_nat-zh-cn-16k-common-vocab8404': 'ContextualParaformer',
+            'iic/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-pytorch': 'Paraformer',
+            'iic/speech_paraformer_asr_nat-zh-cn-16k-common-vocab8358-tensorflow1': 'Paraformer',
+        }
+        for model, expected in cases.items():
+            with self.subTest(model=model):
+                self.assertEqual(self.choose(model), expected)
+
+    def test_local_model_dir(self):
+        local_dir = '/data/models/iic/speech_seaco_paraformer_large_asr_nat-zh-cn-16k-common-vocab8404-pytorch'
+        self.assertEqual(self.choose(local_dir), 'SeacoParaformer')
+
+
+if __name__ == '__main__':
+    unittest.main()